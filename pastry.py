@@ -30,6 +30,43 @@ parser.add_argument(
     help="Timeout in seconds for each benchmark (default: 90)"
 )
 
+parser.add_argument(
+    "--no-minimize",
+    dest="minimize",
+    action="store_false",
+    help="Skip the bisimulation minimization of the probabilistic transition system"
+)
+
+parser.add_argument(
+    "--graph-backend",
+    dest="graph_backend",
+    choices=["rustworkx", "networkx"],
+    default=None,
+    help="Graph library used for the graph analyses (default: rustworkx if installed, otherwise networkx)"
+)
+
+parser.add_argument(
+    "--parallel",
+    dest="parallel",
+    action="store_true",
+    help="Analyze the forward and backward regular Markov chains in two parallel processes"
+)
+
+parser.add_argument(
+    "--cache-dir",
+    dest="cache_dir",
+    type=str,
+    default=None,
+    help="Directory for a persistent cache of the regular Markov chain analyses (default: no cache)"
+)
+
+parser.add_argument(
+    "--explore",
+    dest="explore",
+    action="store_true",
+    help="Only generate the states of the finite chain that are reachable from the initial state"
+)
+
 parser.add_argument(
     "--csv",
     dest="csv",
@@ -72,7 +109,9 @@ def main():
         try:
             signal.signal(signal.SIGALRM, timeout_handler)
             signal.alarm(timeout)
-            result = run_core_analysis(prog_str)
+            result = run_core_analysis(prog_str, minimize=args.minimize, graph_backend=args.graph_backend,
+                                       parallel=args.parallel, cache_dir=args.cache_dir,
+                                       explore=args.explore)
         except TimeoutError as e:
             timeout_occured = True
             result = {
@@ -2,16 +2,38 @@ from src.parsers.parser import parse_pcp
 from src.models.pts import ProbabilisticTransitionSystem
 from src.models.rmc import RegularMarkovChain
 from src.models.lmc import LabeledMarkovChain
-from src.utils.project_utils import analyze_threshold_and_period_from_pts
+from src.utils.project_utils import analyze_threshold_and_period_from_pts, select_jump_bound
+from src.utils.analysis_cache import AnalysisCache
+import multiprocessing
 import logging
 
 logger = logging.getLogger("pastry")
 
-def run_core_analysis(prog_str):
+
+def _build_and_analyze_rmc(pts, direction, threshold, period, graph_backend, cache):
+    """
+    Builds a regular Markov chain and analyzes its level1 states, so that the analysis can run in a worker process.
+    """
+    rmc = RegularMarkovChain(pts, direction, threshold, period, graph_backend, cache)
+    rmc.get_level1_info()
+    return rmc
+
+
+def run_core_analysis(prog_str, minimize=True, graph_backend=None, parallel=False, cache_dir=None,
+                      explore=False):
     """
     Perform termination analysis on a probabilistic counter program.
 
     :param prog_str: A string representing a probabilistic counter program.
+    :param minimize: Whether to reduce the probabilistic transition system to its bisimulation quotient.
+    :param graph_backend: The graph library used for the graph analyses, 'rustworkx' or 'networkx'.
+                          Defaults to rustworkx if it is installed.
+    :param parallel: Whether to build and analyze the forward and backward regular Markov chains in two
+                     worker processes.
+    :param cache_dir: A directory in which the analyses of the regular Markov chains are cached across runs.
+                      No cache is used by default.
+    :param explore: Whether to only generate the part of the finite labeled Markov chain that is reachable
+                    from the initial state.
     :return: A dictionary with Boolean termination results, of the form:
              {
                  "AST": True or False,
@@ -26,17 +48,36 @@ def run_core_analysis(prog_str):
     # Build the probabilistic transition system
     pts = ProbabilisticTransitionSystem(pcp_prog)
 
+    # Merge structural and bisimilar states, as each removed state narrows the regular Markov chains
+    if minimize:
+        pts.minimize()
+
+    # Split large updates where this narrows the levels of the regular Markov chains
+    pts.limit_jump(select_jump_bound(pts))
+
     # Analyze threshold and periods (used to construct regular Markov chains)
-    threshold, period_po, period_ne = analyze_threshold_and_period_from_pts(pts)
+    threshold_po, threshold_ne, period_po, period_ne = analyze_threshold_and_period_from_pts(pts)
+
+    cache = AnalysisCache(cache_dir) if cache_dir is not None else None
 
-    # Build forward-directed regular Markov chain
-    rmc_forward = RegularMarkovChain(pts, 'forward', threshold, period_po)
+    if parallel:
+        # The two regular Markov chains are independent, so they are analyzed concurrently. The pool is
+        # terminated on exit, which also stops the workers if the analysis is interrupted by a timeout.
+        with multiprocessing.Pool(2) as pool:
+            forward = pool.apply_async(_build_and_analyze_rmc,
+                                       (pts, 'forward', threshold_po, period_po, graph_backend, cache))
+            backward = pool.apply_async(_build_and_analyze_rmc,
+                                        (pts, 'backward', threshold_ne, period_ne, graph_backend, cache))
+            rmc_forward, rmc_backward = forward.get(), backward.get()
+    else:
+        # Build forward-directed regular Markov chain
+        rmc_forward = RegularMarkovChain(pts, 'forward', threshold_po, period_po, graph_backend, cache)
 
-    # Build backward-directed regular Markov chain
-    rmc_backward = RegularMarkovChain(pts, 'backward', threshold, period_ne)
+        # Build backward-directed regular Markov chain
+        rmc_backward = RegularMarkovChain(pts, 'backward', threshold_ne, period_ne, graph_backend, cache)
 
     # Construct the finite labeled Markov chain that simulates the program's termination behavior
-    lmc = LabeledMarkovChain(pts, threshold, rmc_forward, rmc_backward)
+    lmc = LabeledMarkovChain(pts, threshold_po, threshold_ne, rmc_forward, rmc_backward, explore)
     result = lmc.is_ast_and_past()
     logger.info(f"Analysis result: AST={result['ast']}, PAST={result['past']}")
     return result
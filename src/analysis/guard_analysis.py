@@ -1,5 +1,7 @@
 import sympy as sp
+import numpy as np
 from collections import deque
+from fractions import Fraction
 import math
 
     
@@ -29,6 +31,123 @@ global_dict["DIV"] = DIV
 global_dict["MOD"] = MOD
 
 
+# Largest intermediate magnitude for which a guard is evaluated on int64 arrays
+INT64_SAFE_BOUND = 2 ** 62
+
+_RELATIONAL_OPERATORS = {sp.Eq: '==', sp.Ne: '!=', sp.Gt: '>', sp.Lt: '<', sp.Ge: '>=', sp.Le: '<='}
+
+
+def _guard_to_source(expr, var, vectorized):
+    """
+    Translates a sympy guard (or arithmetic subexpression) into Python source code over the variable `x`.
+    The vectorized form uses NumPy logical functions so that it can be applied to whole arrays.
+    """
+    if isinstance(expr, sp.logic.boolalg.BooleanTrue):
+        return 'True'
+    if isinstance(expr, sp.logic.boolalg.BooleanFalse):
+        return 'False'
+    if expr == var:
+        return 'x'
+    if isinstance(expr, sp.Integer):
+        return f'({int(expr)})'
+    if isinstance(expr, sp.Rational):
+        return f'Fraction({expr.p}, {expr.q})'
+
+    if isinstance(expr, sp.Add):
+        return '(' + ' + '.join(_guard_to_source(arg, var, vectorized) for arg in expr.args) + ')'
+    if isinstance(expr, sp.Mul):
+        return '(' + ' * '.join(_guard_to_source(arg, var, vectorized) for arg in expr.args) + ')'
+    if isinstance(expr, sp.Pow):
+        exponent = expr.args[1]
+        if not (isinstance(exponent, sp.Integer) and exponent >= 0):
+            raise NotImplementedError(f"Unsupported exponent in guard: {exponent}")
+        return f'({_guard_to_source(expr.args[0], var, vectorized)} ** {int(exponent)})'
+    if isinstance(expr, MOD):
+        return f'({_guard_to_source(expr.args[0], var, vectorized)} % {_guard_to_source(expr.args[1], var, vectorized)})'
+    if isinstance(expr, DIV):
+        return f'({_guard_to_source(expr.args[0], var, vectorized)} // {_guard_to_source(expr.args[1], var, vectorized)})'
+
+    for relational, operator in _RELATIONAL_OPERATORS.items():
+        if isinstance(expr, relational):
+            return f'({_guard_to_source(expr.lhs, var, vectorized)} {operator} {_guard_to_source(expr.rhs, var, vectorized)})'
+
+    if isinstance(expr, (sp.And, sp.Or)):
+        args = [_guard_to_source(arg, var, vectorized) for arg in expr.args]
+        if vectorized:
+            func = 'logical_and' if isinstance(expr, sp.And) else 'logical_or'
+            return f'logical_reduce({func}, [{", ".join(args)}])'
+        operator = ' and ' if isinstance(expr, sp.And) else ' or '
+        return '(' + operator.join(args) + ')'
+    if isinstance(expr, sp.Not):
+        arg = _guard_to_source(expr.args[0], var, vectorized)
+        return f'logical_not({arg})' if vectorized else f'(not {arg})'
+
+    raise NotImplementedError(f"Unsupported guard component: {type(expr)}")
+
+
+def _logical_reduce(func, args):
+    result = args[0]
+    for arg in args[1:]:
+        result = func(result, arg)
+    return result
+
+
+_COMPILED_GUARD_NAMESPACE = {'Fraction': Fraction, 'logical_and': np.logical_and, 'logical_or': np.logical_or,
+                             'logical_not': np.logical_not, 'logical_reduce': _logical_reduce}
+
+
+def compile_guard(spguard, var):
+    """
+    Compiles a sympy guard over the variable `var` into native Python predicates.
+
+    :return: A pair (scalar_predicate, vectorized_predicate); the scalar form maps an int to a bool and
+             the vectorized form maps an integer NumPy array to an array of truth values.
+    """
+    namespace = dict(_COMPILED_GUARD_NAMESPACE)
+    scalar_source = _guard_to_source(spguard, var, vectorized=False)
+    vectorized_source = _guard_to_source(spguard, var, vectorized=True)
+    exec(f'def scalar_predicate(x):\n    return {scalar_source}\n'
+         f'def vectorized_predicate(x):\n    return {vectorized_source}\n', namespace)
+    return namespace['scalar_predicate'], namespace['vectorized_predicate']
+
+
+def get_magnitude_bound(expr, var, bound):
+    """
+    Computes an upper bound on the absolute value of every intermediate result produced while
+    evaluating the guard `expr` for values of `var` in [-bound, bound].
+    """
+    max_intermediate = 0
+
+    def traverse(expr):
+        nonlocal max_intermediate
+        if expr == var:
+            result = bound
+        elif isinstance(expr, sp.Number):
+            result = int(sp.ceiling(abs(expr)))
+        elif isinstance(expr, sp.Add):
+            result = sum(traverse(arg) for arg in expr.args)
+        elif isinstance(expr, sp.Mul):
+            result = math.prod(traverse(arg) for arg in expr.args)
+        elif isinstance(expr, sp.Pow):
+            result = traverse(expr.args[0]) ** int(expr.args[1])
+        elif isinstance(expr, MOD):
+            traverse(expr.args[0])
+            result = traverse(expr.args[1])
+        elif isinstance(expr, DIV):
+            result = traverse(expr.args[0]) + 1
+            traverse(expr.args[1])
+        else:
+            # Relational and boolean nodes only produce truth values
+            for arg in expr.args:
+                traverse(arg)
+            result = 1
+        max_intermediate = max(max_intermediate, result)
+        return result
+
+    traverse(expr)
+    return max_intermediate
+
+
 class GuardExpr():
     """We introduce a new type to represent guards in PCP programs."""
     def __init__(self, guard):
@@ -42,22 +161,89 @@ class GuardExpr():
             self.sp_var = next(iter(variables))
         else:
             self.sp_var = None
+        self._compiled = None
+        self._complement = None
+        self.table = None
+
+    def __getstate__(self):
+        # The compiled predicates are generated functions that cannot be pickled; they are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        return state
+
+    def _get_compiled(self):
+        """
+        Lazily compiles the guard into native predicates, falling back to sympy substitution
+        for guards that contain constructs the compiler does not support.
+        """
+        if self._compiled is None:
+            try:
+                scalar_predicate, vectorized_predicate = compile_guard(self.sp_expr, self.sp_var)
+                exact_integer = not any(isinstance(atom, sp.Number) and not atom.is_Integer
+                                        for atom in self.sp_expr.atoms(sp.Number))
+                self._compiled = (scalar_predicate, vectorized_predicate, exact_integer)
+            except NotImplementedError:
+                self._compiled = (self._evaluate_symbolically, None, False)
+        return self._compiled
+
+    def _evaluate_symbolically(self, value):
+        if self.sp_var:
+            return bool(self.sp_expr.subs(self.sp_var, value))
+        else:
+            return bool(self.sp_expr)
+
+    def get_table(self):
+        """
+        Returns the truth table of the guard, building it on first use. The table of a negated
+        guard is derived from the table of its complement whenever that one already exists.
+        """
+        if self.table is None:
+            if self._complement is not None and self._complement.table is not None:
+                self.table = self._complement.table.negate()
+            else:
+                self.table = GuardTable.from_guard(self)
+        return self.table
 
     def evaluate(self, value):
-        if isinstance(value, int):
-            if self.sp_var:
-                return bool(self.sp_expr.subs(self.sp_var, value))
-            else:
-                return bool(self.sp_expr)
+        if isinstance(value, (int, np.integer)):
+            if self.table is not None:
+                return self.table.evaluate(int(value))
+            return bool(self._get_compiled()[0](int(value)))
         else:
             raise TypeError(f"Input must be an int.(value_type={type(value)})")
 
+    def evaluate_array(self, values):
+        """
+        Evaluates the guard on every element of an integer array and returns a boolean array.
+        """
+        values = np.asarray(values)
+        if self.table is not None:
+            return self.table.evaluate_array(values)
+        scalar_predicate, vectorized_predicate, exact_integer = self._get_compiled()
+        if values.size == 0:
+            return np.zeros(values.shape, dtype=bool)
+        if vectorized_predicate is None:
+            return np.array([scalar_predicate(int(value)) for value in values.flat], dtype=bool).reshape(values.shape)
+
+        bound = max(abs(int(values.min())), abs(int(values.max())))
+        if exact_integer and get_magnitude_bound(self.sp_expr, self.sp_var, bound) < INT64_SAFE_BOUND:
+            arguments = values.astype(np.int64)
+        else:
+            arguments = np.array([int(value) for value in values.flat], dtype=object).reshape(values.shape)
+        result = vectorized_predicate(arguments)
+        return np.broadcast_to(np.asarray(result, dtype=bool), values.shape).copy()
+
     def __str__(self):
         return str(self.sp_expr)
 
     def negate(self):
-        negated_guard = sp.logic.boolalg.Not(self.sp_expr)
-        return GuardExpr(negated_guard)
+        negated_guard = GuardExpr(sp.logic.boolalg.Not(self.sp_expr))
+        negated_guard._complement = self
+        if self._complement is None:
+            self._complement = negated_guard
+        if self.table is not None:
+            negated_guard.table = self.table.negate()
+        return negated_guard
 
 
 def analyze_innermost_MOD_DIV(expr, var, var_tmp):
@@ -170,8 +356,10 @@ def find_minimum_period(value_list):
 
 
 def minimize_guard_threshold_and_period(spguard, var, guard_threshold, guard_period):
-    p_bools = [evaluate_predicate(spguard, {var: j}) for j in [guard_threshold + i for i in range(guard_period)]]
-    n_bools = [evaluate_predicate(spguard, {var: j}) for j in [(-1) * guard_threshold - i for i in range(guard_period)]]
+    guard_threshold, guard_period = int(guard_threshold), int(guard_period)
+    predicate = GuardExpr(spguard).evaluate
+    p_bools = [predicate(j) for j in [guard_threshold + i for i in range(guard_period)]]
+    n_bools = [predicate(j) for j in [(-1) * guard_threshold - i for i in range(guard_period)]]
 
     guard_period_p = find_minimum_period(p_bools)
     guard_period_n = find_minimum_period(n_bools)
@@ -180,16 +368,16 @@ def minimize_guard_threshold_and_period(spguard, var, guard_threshold, guard_per
     n_counter = -guard_threshold
     deque_p = deque()
     for i in range(p_counter - 1 + guard_period_p, p_counter - 1, -1):
-        deque_p.append(evaluate_predicate(spguard, {var: i}))
+        deque_p.append(predicate(i))
     deque_n = deque()
     for i in range(n_counter + 1 - guard_period_n, n_counter + 1):
-        deque_n.append(evaluate_predicate(spguard, {var: i}))
+        deque_n.append(predicate(i))
 
     p_counter -= 1
     n_counter += 1
     while (p_counter >= n_counter):
-        deque_p.append(evaluate_predicate(spguard, {var: p_counter}))
-        deque_n.append(evaluate_predicate(spguard, {var: n_counter}))
+        deque_p.append(predicate(p_counter))
+        deque_n.append(predicate(n_counter))
         if deque_p[0] != deque_p[-1] or deque_n[0] != deque_n[-1]:
             break
         else:
@@ -236,3 +424,98 @@ def get_threshold_and_period_from_spguard(spguard):
                                                                                                         guard_threshold,
                                                                                                         guard_period)
     return int(guard_threshold), int(guard_period_positive), int(guard_period_negative)
+
+
+class GuardTable():
+    """
+    Truth table of a 1-d guard. The truth values over [-threshold, threshold] are stored as a packed
+    bit array, and beyond the threshold the guard repeats a periodic pattern on each axis.
+    """
+    def __init__(self, threshold, inner_values, positive_pattern, negative_pattern):
+        """
+        :param threshold: The guard threshold T. (int)
+        :param inner_values: Truth values for x = -T, ..., T. (array of bool)
+        :param positive_pattern: Truth values for x = T + 1, ..., T + period_positive. (array of bool)
+        :param negative_pattern: Truth values for x = -T - 1, ..., -T - period_negative. (array of bool)
+        """
+        self.threshold = threshold
+        self.positive_pattern = np.asarray(positive_pattern, dtype=bool)
+        self.negative_pattern = np.asarray(negative_pattern, dtype=bool)
+        self.period_positive = len(self.positive_pattern)
+        self.period_negative = len(self.negative_pattern)
+        self._packed = np.packbits(np.asarray(inner_values, dtype=bool)).tobytes()
+
+    @classmethod
+    def from_guard(cls, guard):
+        """
+        Builds the truth table of a GuardExpr from its threshold and periods.
+        """
+        threshold, period_positive, period_negative = get_threshold_and_period_from_spguard(guard.sp_expr)
+        inner_values = guard.evaluate_array(np.arange(-threshold, threshold + 1))
+        positive_pattern = guard.evaluate_array(np.arange(threshold + 1, threshold + 1 + period_positive))
+        negative_pattern = guard.evaluate_array(-np.arange(threshold + 1, threshold + 1 + period_negative))
+        return cls(threshold, inner_values, positive_pattern, negative_pattern)
+
+    def evaluate(self, value):
+        """
+        Returns the truth value of the guard at the integer `value` in constant time.
+        """
+        if value > self.threshold:
+            return bool(self.positive_pattern[(value - self.threshold - 1) % self.period_positive])
+        if value < -self.threshold:
+            return bool(self.negative_pattern[(-self.threshold - 1 - value) % self.period_negative])
+        index = value + self.threshold
+        return bool((self._packed[index >> 3] >> (7 - (index & 7))) & 1)
+
+    def get_axis_thresholds(self):
+        """
+        Returns the least thresholds (t_po, t_ne), both at most the threshold, such that the guard repeats its
+        positive pattern for x > t_po and its negative pattern for x < -t_ne.
+        """
+        values = np.arange(1, self.threshold + 1)
+        positive_mismatches = np.flatnonzero(self.evaluate_array(values) !=
+                                             self.evaluate_array(values + self.period_positive))
+        negative_mismatches = np.flatnonzero(self.evaluate_array(-values) !=
+                                             self.evaluate_array(-values - self.period_negative))
+        threshold_positive = int(values[positive_mismatches[-1]]) if positive_mismatches.size > 0 else 0
+        threshold_negative = int(values[negative_mismatches[-1]]) if negative_mismatches.size > 0 else 0
+        return threshold_positive, threshold_negative
+
+    def evaluate_range(self, start, stop):
+        """
+        Returns the truth values of the guard for x = start, ..., stop - 1 as a boolean array.
+        """
+        return self.evaluate_array(np.arange(start, stop))
+
+    def evaluate_array(self, values):
+        """
+        Returns the truth values of the guard for every element of an integer array.
+        """
+        values = np.asarray(values, dtype=np.int64)
+        result = np.empty(values.shape, dtype=bool)
+        positive = values > self.threshold
+        negative = values < -self.threshold
+        inner = ~(positive | negative)
+        result[positive] = self.positive_pattern[(values[positive] - self.threshold - 1) % self.period_positive]
+        result[negative] = self.negative_pattern[(-self.threshold - 1 - values[negative]) % self.period_negative]
+        if inner.any():
+            inner_indices = values[inner] + self.threshold
+            low, high = int(inner_indices.min()), int(inner_indices.max())
+            packed = np.frombuffer(self._packed, dtype=np.uint8, count=(high >> 3) - (low >> 3) + 1,
+                                   offset=low >> 3)
+            bits = np.unpackbits(packed).astype(bool)
+            result[inner] = bits[inner_indices - (low & ~7)]
+        return result
+
+    def negate(self):
+        """
+        Returns the truth table of the negated guard.
+        """
+        table = GuardTable.__new__(GuardTable)
+        table.threshold = self.threshold
+        table.positive_pattern = ~self.positive_pattern
+        table.negative_pattern = ~self.negative_pattern
+        table.period_positive = self.period_positive
+        table.period_negative = self.period_negative
+        table._packed = np.invert(np.frombuffer(self._packed, dtype=np.uint8)).tobytes()
+        return table
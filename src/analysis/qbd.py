@@ -0,0 +1,131 @@
+import numpy as np
+import scipy.linalg as la
+import scipy.sparse as scip
+import scipy.sparse.linalg as spla
+import logging
+
+logger = logging.getLogger("pastry")
+
+QBD_METHODS = ('logarithmic_reduction', 'cyclic_reduction', 'newton', 'functional')
+
+
+def get_qbd_residual(A, B, C, G):
+    """
+    Returns the infinity norm of A + B G + C G G - G.
+    """
+    return float(np.abs(A.toarray() + B @ G + C @ (G @ G) - G).sum(axis=1).max(initial=0.0))
+
+
+def _solve_functional(A, B, C, tol, max_iter):
+    """
+    Plain functional iteration G <- A + B G + C G G starting from zero, which converges linearly.
+    """
+    A_dense = A.toarray()
+    G = np.zeros(A.shape)
+    for iteration in range(1, max_iter + 1):
+        G_next = A_dense + B @ G + C @ (G @ G)
+        if np.abs(G_next - G).max(initial=0.0) < tol:
+            return G_next, iteration
+        G = G_next
+    return G, max_iter
+
+
+def _solve_logarithmic_reduction(A, B, C, tol, max_iter):
+    """
+    Logarithmic reduction of Latouche and Ramaswami. After k iterations, G accounts for all paths that reach
+    the level below before rising 2^k levels, so the iteration converges quadratically unless the chain
+    is null recurrent.
+    """
+    size = A.shape[0]
+    local = scip.identity(size, format='csc') - scip.csc_matrix(B)
+    lu = spla.splu(local)
+    down, up = lu.solve(A.toarray()), lu.solve(C.toarray())
+    G, T = down.copy(), up.copy()
+    for iteration in range(1, max_iter + 1):
+        mixed = np.eye(size) - down @ up - up @ down
+        down, up = la.solve(mixed, down @ down), la.solve(mixed, up @ up)
+        G = G + T @ down
+        T = T @ up
+        if get_qbd_residual(A, B, C, G) < tol:
+            return G, iteration
+    return G, max_iter
+
+
+def _solve_cyclic_reduction(A, B, C, tol, max_iter):
+    """
+    Cyclic reduction of Bini and Meini for A + (B - I) G + C G G = 0, which halves the number of levels in
+    every iteration and converges quadratically unless the chain is null recurrent.
+    """
+    size = A.shape[0]
+    down, up = A.toarray(), C.toarray()
+    local = B.toarray() - np.eye(size)
+    local_hat = local.copy()
+    G = np.zeros((size, size))
+    for iteration in range(1, max_iter + 1):
+        local_down, local_up = la.solve(local, down), la.solve(local, up)
+        local = local - down @ local_up - up @ local_down
+        local_hat = local_hat - up @ local_down
+        down, up = -down @ local_down, -up @ local_up
+        G = -la.solve(local_hat, A.toarray())
+        if get_qbd_residual(A, B, C, G) < tol:
+            return G, iteration
+    return G, max_iter
+
+
+def _solve_newton(A, B, C, tol, max_iter):
+    """
+    Newton's method starting from zero, which converges monotonically to the minimal solution. Every Newton
+    correction H solves the linear matrix equation (B + C G - I) H + C H G = -F(G) with GMRES, where the
+    operator is applied through products with the sparse matrices B and C.
+    """
+    size = A.shape[0]
+    A_dense = A.toarray()
+    G = np.zeros((size, size))
+    for iteration in range(1, max_iter + 1):
+        residual = A_dense + B @ G + C @ (G @ G) - G
+        if np.abs(residual).sum(axis=1).max(initial=0.0) < tol:
+            return G, iteration - 1
+
+        def apply_derivative(vector, G=G):
+            H = vector.reshape(size, size)
+            return (B @ H + C @ (G @ H) + C @ (H @ G) - H).ravel()
+
+        operator = spla.LinearOperator((size * size, size * size), matvec=apply_derivative, dtype=float)
+        correction, info = spla.gmres(operator, -residual.ravel(), rtol=tol * 1e-2, atol=0.0,
+                                      restart=min(size * size, 50), maxiter=1000)
+        if info != 0:
+            logger.warning("GMRES did not converge in Newton iteration %d (info: %d).", iteration, info)
+        G = G + correction.reshape(size, size)
+    return G, max_iter
+
+
+def solve_qbd_g_matrix(A, B, C, method='logarithmic_reduction', tol=1e-8, max_iter=50000):
+    """
+    Computes the minimal nonnegative solution G of the quasi-birth-death equation G = A + B G + C G G,
+    where A, B and C are the transition matrices to the level below, the same level and the level above.
+    Methods that need a nonsingular factorization fall back to functional iteration if it is singular.
+
+    :param A: The transitions to the level below as a SciPy sparse matrix of floats.
+    :param method: One of 'logarithmic_reduction', 'cyclic_reduction', 'newton' and 'functional'. (str)
+    :return: The matrix G, the number of iterations and the final residual. (tuple)
+    """
+    solvers = {'logarithmic_reduction': _solve_logarithmic_reduction, 'cyclic_reduction': _solve_cyclic_reduction,
+               'newton': _solve_newton, 'functional': _solve_functional}
+    if method not in solvers:
+        logger.error("Invalid QBD solver: '%s'. Expected one of %s.", method, ', '.join(QBD_METHODS))
+        raise ValueError("Unknown QBD solver")
+
+    A, B, C = scip.csr_matrix(A, dtype=float), scip.csr_matrix(B, dtype=float), scip.csr_matrix(C, dtype=float)
+    try:
+        G, iterations = solvers[method](A, B, C, tol, max_iter)
+    except (RuntimeError, la.LinAlgError) as error:
+        logger.warning("QBD solver '%s' failed (%s), falling back to functional iteration.", method, error)
+        method = 'functional'
+        G, iterations = _solve_functional(A, B, C, tol, max_iter)
+
+    residual = get_qbd_residual(A, B, C, G)
+    if iterations >= max_iter:
+        logger.warning("Maximum number of iterations (%d) reached without convergence of QBD solver '%s' (residual: %g).", max_iter, method, residual)
+    else:
+        logger.info("QBD solver '%s' converged after %d iterations (residual: %g).", method, iterations, residual)
+    return G, iterations, residual
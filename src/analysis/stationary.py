@@ -0,0 +1,175 @@
+from fractions import Fraction
+import math
+import numpy as np
+import scipy.sparse as scip
+import scipy.sparse.linalg as spla
+import logging
+
+logger = logging.getLogger("pastry")
+
+
+def _get_balance_equations(matrix):
+    """
+    Builds the integer balance equations of the stationary distribution of a rational transition matrix.
+    Writing row i of the matrix as N[i, :] / d_i and substituting pi_i = d_i * y_i, the equations
+    pi P = pi become sum_i N[i, j] * y_i - d_j * y_j = 0 for every state j.
+
+    :return: The equations as dictionaries {i: coefficient of y_i}, and the row denominators d. (tuple)
+    """
+    size = matrix.shape[0]
+    denominators = [int(denominator) for denominator in matrix.denominators.tolist()]
+    equations = [{j: -denominators[j]} for j in range(size)]
+    numerators = matrix.numerators.tolist()
+    indices = matrix.indices.tolist()
+    indptr = matrix.indptr.tolist()
+    for i in range(size):
+        for position in range(indptr[i], indptr[i + 1]):
+            j = indices[position]
+            coefficient = equations[j].get(i, 0) + int(numerators[position])
+            if coefficient == 0:
+                equations[j].pop(i, None)
+            else:
+                equations[j][i] = coefficient
+    return equations, denominators
+
+
+def _reduce_row(row):
+    """
+    Divides an integer row by the greatest common divisor of its coefficients.
+    """
+    divisor = math.gcd(*row.values())
+    if divisor > 1:
+        for column in row:
+            row[column] //= divisor
+    return row
+
+
+def _select_pivot(rows, column_rows):
+    """
+    Selects the pivot with the smallest Markowitz cost (r - 1) * (c - 1), where r and c are the numbers of
+    nonzero coefficients in the row and the column of the pivot. Ties are broken by the smallest magnitude.
+    """
+    best, best_key = None, None
+    for row_index, row in rows.items():
+        for column, coefficient in row.items():
+            key = ((len(row) - 1) * (len(column_rows[column]) - 1), abs(coefficient))
+            if best_key is None or key < best_key:
+                best, best_key = (row_index, column), key
+        if best_key[0] == 0:
+            break
+    return best
+
+
+def solve_stationary_distribution(matrix):
+    """
+    Computes the exact stationary distribution of an irreducible Markov chain by fraction-free sparse
+    elimination. The balance equations are kept as integer rows that are reduced by their gcd after every
+    elimination step, and pivots are chosen by the Markowitz criterion to limit fill-in.
+
+    :param matrix: The transition matrix of the chain. (SparseRationalMatrix)
+    :return: The stationary probability of every state. (list of Fraction)
+    """
+    equations, denominators = _get_balance_equations(matrix)
+    rows = {index: row for index, row in enumerate(equations) if row}
+    column_rows = dict()
+    for row_index, row in rows.items():
+        for column in row:
+            column_rows.setdefault(column, set()).add(row_index)
+
+    # Forward elimination: every pivot row determines its pivot variable from the later ones
+    pivots = []
+    while rows:
+        row_index, column = _select_pivot(rows, column_rows)
+        pivot_row = rows.pop(row_index)
+        for pivot_column in pivot_row:
+            column_rows[pivot_column].discard(row_index)
+        pivot = pivot_row[column]
+        for other_index in list(column_rows.pop(column)):
+            other_row = rows[other_index]
+            factor = other_row[column]
+            divisor = math.gcd(pivot, factor)
+            pivot_scale, factor_scale = pivot // divisor, factor // divisor
+            for other_column in other_row:
+                other_row[other_column] *= pivot_scale
+            for pivot_column, coefficient in pivot_row.items():
+                value = other_row.get(pivot_column, 0) - factor_scale * coefficient
+                if value == 0:
+                    if pivot_column in other_row:
+                        del other_row[pivot_column]
+                        if pivot_column != column:
+                            column_rows[pivot_column].discard(other_index)
+                else:
+                    if pivot_column not in other_row:
+                        column_rows.setdefault(pivot_column, set()).add(other_index)
+                    other_row[pivot_column] = value
+            if other_row:
+                _reduce_row(other_row)
+            else:
+                del rows[other_index]
+        pivots.append((column, pivot_row))
+
+    free_columns = set(range(len(equations))) - {column for column, _ in pivots}
+    if len(free_columns) > 1:
+        logger.error("Multiple solutions found for steady-state distribution. Expected a unique solution.")
+        raise ValueError("Multiple solutions found, expected a unique solution.")
+    if not free_columns:
+        logger.error("No solution found for the stationary distribution.")
+        raise ValueError("No solution found for the stationary distribution.")
+
+    # Back substitution with the free variable fixed to one
+    values = {free_columns.pop(): Fraction(1)}
+    for column, pivot_row in reversed(pivots):
+        total = sum(coefficient * values[other_column]
+                    for other_column, coefficient in pivot_row.items() if other_column != column)
+        values[column] = Fraction(-total, pivot_row[column])
+
+    distribution = [denominators[state] * values[state] for state in range(len(equations))]
+    total = sum(distribution)
+    if min(distribution) * max(distribution) < 0 or total == 0:
+        logger.error("No solution found for the stationary distribution.")
+        raise ValueError("No solution found for the stationary distribution.")
+    return [probability / total for probability in distribution]
+
+
+def get_stationary_drift(matrix, steps):
+    """
+    Computes the exact drift sum_i pi_i * steps[i] of an irreducible Markov chain with stationary distribution pi.
+    """
+    return sum(probability * step for probability, step in zip(solve_stationary_distribution(matrix), steps))
+
+
+def estimate_stationary_drift(matrix, steps, safety_factor=10.0):
+    """
+    Computes the drift sum_i pi_i * steps[i] of an irreducible Markov chain in floating point together with a
+    bound on its error. The stationary distribution is obtained from a sparse LU factorization of the balance
+    equations, one of which is replaced by the normalization. Its error is bounded by the norm of the residual
+    times an estimate of the 1-norm of the inverse, inflated by the safety factor to cover the estimation and
+    rounding errors.
+
+    :param matrix: The transition matrix of the chain. (SparseRationalMatrix)
+    :param steps: The level change associated with every state. (list)
+    :return: A pair (drift, error_bound), where the bound is infinite if the factorization fails. (tuple)
+    """
+    size = matrix.shape[0]
+    balance = (matrix.to_float().T - scip.identity(size, format='csr')).tocsr()
+    system = scip.vstack([balance[:size - 1], np.ones((1, size))]).tocsc()
+    rhs = np.zeros(size)
+    rhs[-1] = 1.0
+    try:
+        lu = spla.splu(system)
+    except RuntimeError:
+        return 0.0, math.inf
+
+    distribution = lu.solve(rhs)
+    if not np.all(np.isfinite(distribution)):
+        return 0.0, math.inf
+    residual_norm = np.abs(system @ distribution - rhs).sum()
+    inverse = spla.LinearOperator((size, size), matvec=lu.solve, rmatvec=lambda vector: lu.solve(vector, trans='T'),
+                                  dtype=float)
+    inverse_norm = spla.onenormest(inverse) if size > 1 else abs(1 / system[0, 0])
+
+    steps = np.asarray(steps, dtype=float)
+    drift = float(steps @ distribution)
+    rounding_error = size * np.finfo(float).eps * (1 + np.abs(distribution).sum())
+    error_bound = safety_factor * (inverse_norm * (residual_norm + rounding_error) + rounding_error) * np.abs(steps).max()
+    return drift, error_bound
@@ -0,0 +1,63 @@
+import numpy as np
+import scipy.sparse as scip
+from src.utils.sparse_rational import SparseRationalMatrix
+from src.utils.graph_backend import DiGraph
+
+
+class AbstractChain:
+    """
+    Implicit view of the abstract chain of a regular Markov chain, the 3w-state chain over levels 0, 1 and 2
+    whose transition matrix consists of three block rows [A, B, C]. State l * w + i stands for state i on level l,
+    and its outgoing transitions do not depend on l, so only the block row [A, B, C] is stored.
+    """
+    def __init__(self, A, B, C, graph_backend=None):
+        self.width = A.shape[0]
+        self.states_num = 3 * self.width
+        self.graph_backend = graph_backend
+        self.blocks = (A, B, C)
+        self.transitions = SparseRationalMatrix.block([[A, B, C]])
+
+    def edges(self):
+        """
+        Returns the sources and the targets of all transitions of the abstract chain.
+        """
+        out_degrees = np.tile(np.diff(self.transitions.indptr), 3)
+        sources = np.repeat(np.arange(self.states_num), out_degrees)
+        targets = np.tile(self.transitions.indices, 3)
+        return sources, targets
+
+    def strongly_connected_components(self):
+        """
+        Computes the strongly connected components from those of the w-state graph H with an edge i -> j
+        whenever A, B or C has a transition from i to j. A non-trivial component K of H induces the component
+        of the abstract chain that contains state l * w + i iff the block of level l has a transition from
+        some k in K to i. All remaining states form trivial components.
+        """
+        union_pattern = scip.csr_matrix(sum(block.to_bool().astype(np.int8) for block in self.blocks), dtype=bool)
+        components = DiGraph.from_csr(union_pattern.indptr, union_pattern.indices, self.graph_backend)\
+            .strongly_connected_components()
+
+        component_of = np.empty(self.width, dtype=np.int64)
+        for index, component in enumerate(components):
+            component_of[component] = index
+
+        # A transition inside a component of H only exists if the component is non-trivial
+        members = [[] for _ in components]
+        in_component = np.zeros(self.states_num, dtype=bool)
+        for level, block in enumerate(self.blocks):
+            pattern = block.to_bool().tocoo()
+            inner = component_of[pattern.row] == component_of[pattern.col]
+            states = np.unique(pattern.col[inner])
+            for state in states.tolist():
+                members[component_of[state]].append(level * self.width + state)
+            in_component[level * self.width + states] = True
+
+        sccs = [component_states for component_states in members if component_states]
+        sccs.extend([state] for state in np.flatnonzero(~in_component).tolist())
+        return sccs
+
+    def submatrix(self, states):
+        """
+        Extracts the transition matrix between the given states of the abstract chain.
+        """
+        return self.transitions.submatrix([state % self.width for state in states], states)
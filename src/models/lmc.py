@@ -1,89 +1,382 @@
-import networkx as nx
+from collections import deque
 import numpy as np
+import scipy.sparse as scip
+import scipy.sparse.csgraph as csgraph
 import logging
 
 logger = logging.getLogger("pastry")
 
 class LabeledMarkovChain:
-    def __init__(self, pts, threshold, forward_rmc, backward_rmc):
+    """
+    Finite graph that simulates the termination behavior of a PCP. Its nodes are numbered contiguously:
+    the global states (s, x) of the irregular part with -threshold_ne <= x <= threshold_po come first, followed by the states
+    (direction, (level, i)) on levels 0 and 1 of the forward and of the backward regular Markov chain, and by
+    the initial state if it lies outside the irregular part. The edges are stored as a boolean CSR matrix,
+    and the tuple labels are only recovered on demand.
+
+    By default, the whole chain is built. In exploration mode, the nodes reachable from the initial state are
+    only generated while the verdict is computed, which stops as soon as the verdict is settled, and a regular
+    Markov chain is only analyzed once its level 1 is reached.
+    """
+    def __init__(self, pts, threshold_po, threshold_ne, forward_rmc, backward_rmc, explore=False):
         logger.info("Starting creation of Labeled Markov Chain.")
         
         self.pts = pts
-        self.threshold = threshold
+        self.threshold_po = threshold_po
+        self.threshold_ne = threshold_ne
         self.forward_rmc = forward_rmc
         self.backward_rmc = backward_rmc
         self.initial_state = (0, self.pts.init_val)
         self.terminal_state = (self.pts.states_num - 1, 0)
-        self.transient_states, self.null_recurrent_states = set(), set()
 
-        self.G = nx.DiGraph()
-        self.G.add_node(self.initial_state)
-        self.G.add_node(self.terminal_state)
+        self.irregular_width = self.threshold_po + self.threshold_ne + 1
+        self.regular_offsets = {'forward': self.pts.states_num * self.irregular_width}
+        self.regular_offsets['backward'] = self.regular_offsets['forward'] + 2 * forward_rmc.rmc_width
+        self.nodes_num = self.regular_offsets['backward'] + 2 * backward_rmc.rmc_width
+        if not self.is_irregular_value(self.pts.init_val):
+            self.nodes_num += 1
+        self.initial_node = self.get_node(self.initial_state)
+        self.terminal_node = self.get_node(self.terminal_state)
+        self.transient_nodes = np.zeros(self.nodes_num, dtype=bool)
+        self.null_recurrent_nodes = np.zeros(self.nodes_num, dtype=bool)
+
+        self._check_update_values()
+        self._level1_edges = dict()
+        self._edge_sources, self._edge_targets = [], []
+        self.explore = explore
+        if explore:
+            # The graph and the post set are generated by is_ast_and_past
+            self.graph, self.post_set = None, None
+            logger.info("Labeled Markov Chain successfully created for exploration. Number of states: %s", self.nodes_num)
+            return
 
         self._convert_irregular_part_to_graph()
         self._convert_regular_part_to_graph('forward')
         self._convert_regular_part_to_graph('backward')
-
-        self.post_set = nx.descendants(self.G, self.initial_state)
-        self.post_set.add(self.initial_state)
+        if not self.is_irregular_value(self.pts.init_val):
+            successors = self._get_far_initial_successors()
+            self._add_edges([self.initial_node] * len(successors), successors)
+        self._build_graph()
+        self.post_set = self.get_reachable_nodes(self.graph, self.initial_node)
         
-        logger.info("Labeled Markov Chain successfully created. Number of states: %s", self.G.number_of_nodes())
+        logger.info("Labeled Markov Chain successfully created. Number of states: %s, edges: %s", self.nodes_num, self.graph.nnz)
+
+    def _build_graph(self):
+        """
+        Assembles the collected edges into the CSR graph.
+        """
+        sources, targets = np.concatenate(self._edge_sources), np.concatenate(self._edge_targets)
+        self.graph = scip.csr_matrix((np.ones(sources.size, dtype=bool), (sources, targets)),
+                                     shape=(self.nodes_num, self.nodes_num))
+        self.graph.sum_duplicates()
+        self._edge_sources, self._edge_targets = [], []
+
+    def get_node(self, label):
+        """
+        Returns the node number of a global state (s, x) in the irregular part, of a regular Markov chain state
+        (direction, (level, i)) with level 0 or 1, or of the initial state.
+        """
+        if label[0] in self.regular_offsets:
+            direction, (level, i) = label
+            rmc = self.forward_rmc if direction == 'forward' else self.backward_rmc
+            if level in (0, 1) and 0 <= i < rmc.rmc_width:
+                return self.regular_offsets[direction] + level * rmc.rmc_width + i
+        else:
+            pts_state, variable_value = label
+            if self.is_irregular_value(variable_value):
+                return pts_state * self.irregular_width + variable_value + self.threshold_ne
+            if label == self.initial_state:
+                return self.nodes_num - 1
+        logger.error("The state %s is not a node of the Labeled Markov Chain.", label)
+        raise ValueError("Unknown Labeled Markov Chain state")
+
+    def get_label(self, node):
+        """
+        Returns the state that a node stands for, i.e., the inverse of get_node.
+        """
+        node = int(node)
+        if node < self.regular_offsets['forward']:
+            pts_state, offset = divmod(node, self.irregular_width)
+            return pts_state, offset - self.threshold_ne
+        for direction, rmc in (('backward', self.backward_rmc), ('forward', self.forward_rmc)):
+            if node >= self.regular_offsets[direction]:
+                level, i = divmod(node - self.regular_offsets[direction], rmc.rmc_width)
+                if level < 2:
+                    return direction, (level, i)
+                break
+        return self.initial_state
+
+    def is_irregular_value(self, variable_value):
+        """
+        Tells whether a counter value lies in the irregular part [-threshold_ne, threshold_po]. Also works
+        elementwise on arrays.
+        """
+        return (-self.threshold_ne <= variable_value) & (variable_value <= self.threshold_po)
+
+    def _add_edges(self, sources, targets):
+        self._edge_sources.append(np.asarray(sources, dtype=np.int64))
+        self._edge_targets.append(np.asarray(targets, dtype=np.int64))
+
+    @staticmethod
+    def get_reachable_nodes(graph, node):
+        """
+        Returns a boolean array marking the nodes reachable from a node in a CSR graph, including the node itself.
+        """
+        reachable = np.zeros(graph.shape[0], dtype=bool)
+        reachable[csgraph.breadth_first_order(graph, node, directed=True, return_predecessors=False)] = True
+        return reachable
+
+    def _check_update_values(self):
+        transitions = self.pts.transitions
+        width = self.irregular_width
+        too_long = np.flatnonzero(np.abs(transitions.update) > width)
+        if too_long.size > 0:
+            k = int(too_long[0])
+            state_pair = (int(transitions.source[k]), int(transitions.target[k]))
+            update_value = int(transitions.update[k])
+            logger.error(f"Update value {update_value} for state pair {state_pair} jumps over the irregular part of width {width}")
+            raise ValueError(f"Invalid update value {update_value} encountered for state pair {state_pair}")
+
+    def _get_level1_edges(self, direction):
+        """
+        Analyzes the level 1 states of a regular Markov chain, marks the transient and null recurrent ones, and
+        returns the edges from level 1 to level 0 given by the boolean reachability matrix as a CSR matrix.
+        """
+        if direction not in self._level1_edges:
+            rmc = self.forward_rmc if direction == 'forward' else self.backward_rmc
+            transient_level1_states, nullrec_level1_states, reachability_matrix = rmc.get_level1_info()
+            self.transient_nodes[[self.get_node(state) for state in transient_level1_states]] = True
+            self.null_recurrent_nodes[[self.get_node(state) for state in nullrec_level1_states]] = True
+            self._level1_edges[direction] = reachability_matrix.to_csr()
+        return self._level1_edges[direction]
+
+    def _get_enabled_transitions(self, values):
+        """
+        Evaluates every guard once on an array of counter values. Entry (t, k) of the returned arrays tells
+        whether transition t is enabled at counter value values[k], and which counter value it leads to.
+        """
+        transitions = self.pts.transitions
+        guards_values = np.array([guard.evaluate_array(values) for guard in transitions.guards],
+                                 dtype=bool).reshape(len(transitions.guards), len(values))
+        return guards_values[transitions.guard_id], values + transitions.update.astype(np.int64)[:, None]
+
+    def _get_irregular_adjacency(self):
+        """
+        Builds the adjacency matrix of the irregular part, whose node s * (threshold_po + threshold_ne + 1) + x
+        + threshold_ne stands for the global state (s, x) with -threshold_ne <= x <= threshold_po. Every guard is
+        evaluated once over the whole irregular part, and the edges of all transitions are computed at once.
+        """
+        transitions = self.pts.transitions
+        width = self.irregular_width
+        values = np.arange(-self.threshold_ne, self.threshold_po + 1)
+
+        # Transitions leaving the irregular part are connected to the regular parts separately
+        enabled, target_values = self._get_enabled_transitions(values)
+        enabled &= self.is_irregular_value(target_values)
+        sources = transitions.source[:, None] * width + values + self.threshold_ne
+        targets = transitions.target[:, None] * width + target_values + self.threshold_ne
+        nodes_num = self.pts.states_num * width
+        adjacency = scip.csr_matrix((np.ones(int(enabled.sum()), dtype=bool), (sources[enabled], targets[enabled])),
+                                    shape=(nodes_num, nodes_num))
+        adjacency.sum_duplicates()
+        return adjacency
 
     def _convert_irregular_part_to_graph(self):
-        for state_pair, transitions_list in self.pts.states_transitions_dict.items():
-            for transition in transitions_list:
-                if transition['update_value'] == 0:
-                    for x in range(-self.threshold, self.threshold + 1):
-                        if transition['guard'].evaluate(x):
-                            self.G.add_edge((state_pair[0], x), (state_pair[1], x))
-
-                elif transition['update_value'] == 1:
-                    for x in range(-self.threshold, self.threshold):
-                        if transition['guard'].evaluate(x):
-                            self.G.add_edge((state_pair[0], x), (state_pair[1], x + 1))
-
-                elif transition['update_value'] == -1:
-                    for x in range(self.threshold, -self.threshold, -1):
-                        if transition['guard'].evaluate(x):
-                            self.G.add_edge((state_pair[0], x), (state_pair[1], x - 1))
-
-                else:
-                    logger.error(f"Invalid update value encountered: {transition['update_value']} for state pair: {state_pair}")
-                    raise ValueError(f"Invalid update value {transition['update_value']} encountered for state pair {state_pair}")
+        adjacency = self._get_irregular_adjacency().tocoo()
+        self._add_edges(adjacency.row, adjacency.col)
 
     def _convert_regular_part_to_graph(self, direction):
         if direction == 'forward':
             rmc = self.forward_rmc
-            boundary_value = self.threshold
+            boundary_value = self.threshold_po
         elif direction == 'backward':
             rmc = self.backward_rmc
-            boundary_value = -self.threshold
+            boundary_value = -self.threshold_ne
         else:
             logger.error("Invalid direction: '%s'. Expected 'forward' or 'backward'.", direction)
             raise ValueError("Invalid direction")
+        level0_offset = self.regular_offsets[direction]
+        level1_offset = level0_offset + rmc.rmc_width
+
+        # Updates of at most max_jump only connect the outermost max_jump columns of the irregular part
+        # with the first max_jump columns of level 0 of the regular part, so only the transitions on these
+        # columns are evaluated
+        boundary_width = min(self.pts.max_jump, self.irregular_width)
+        sign = 1 if direction == 'forward' else -1
+        transitions = self.pts.transitions
+        states_num = self.pts.states_num
+
+        # Transitions from the boundary of the irregular part into the first level of the regular part
+        boundary_values = boundary_value - sign * np.arange(boundary_width)
+        enabled, target_values = self._get_enabled_transitions(boundary_values)
+        levels, columns = np.divmod((sign * target_values - rmc.threshold - 1) * states_num
+                                    + transitions.target[:, None], rmc.rmc_width)
+        enabled &= (sign * target_values > rmc.threshold) & (levels == 0)
+        sources = transitions.source[:, None] * self.irregular_width + boundary_values + self.threshold_ne
+        self._add_edges(sources[enabled], level0_offset + columns[enabled])
+
+        # Transitions from the regular part back to the boundary of the irregular part. Column i of level 0
+        # stands for the global state (i % states_num, sign * (rmc.threshold + 1 + i // states_num)).
+        entry_columns_num = min(rmc.rmc_width, self.pts.max_jump * states_num)
+        multiples = np.arange(-(-entry_columns_num // states_num))
+        enabled, target_values = self._get_enabled_transitions(sign * (rmc.threshold + 1 + multiples))
+        rmc_columns = multiples * states_num + transitions.source[:, None]
+        enabled &= self.is_irregular_value(target_values) & (rmc_columns < entry_columns_num)
+        targets = transitions.target[:, None] * self.irregular_width + target_values + self.threshold_ne
+        self._add_edges(level0_offset + rmc_columns[enabled], targets[enabled])
+
+        for matrix, target_offset in ((rmc.B, level0_offset), (rmc.C, level1_offset)):
+            self._add_edges(level0_offset + np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr)),
+                            target_offset + matrix.indices)
 
-        connection_rmc_states = {(direction, (0, i)) for i in range(self.pts.states_num)}
-        connection_irmc_states = {(i, boundary_value) for i in range(self.pts.states_num)}
-        for connection_rmc_state in connection_rmc_states:
-            rmc_state = rmc.get_global_state(connection_rmc_state[1])
-            for connection_irmc_state in connection_irmc_states:
-                if self.pts.get_mc_transition_prob(connection_irmc_state, rmc_state):
-                    self.G.add_edge(connection_irmc_state, connection_rmc_state)
-                if self.pts.get_mc_transition_prob(rmc_state, connection_irmc_state):
-                    self.G.add_edge(connection_rmc_state, connection_irmc_state)
-
-        for i, j in rmc.B_nonzero_locs:
-            self.G.add_edge((direction, (0, i)), (direction, (0, j)))
-        for i, j in rmc.C_nonzero_locs:
-            self.G.add_edge((direction, (0, i)), (direction, (1, j)))
-
-        transient_level1_states, nullrec_level1_states, reachability_matrix = rmc.get_level1_info()
-        for i, j in np.ndindex(reachability_matrix.shape):
-            if reachability_matrix[i, j]:
-                self.G.add_edge((direction, (1, i)), (direction, (0, j)))
-
-        self.transient_states |= transient_level1_states
-        self.null_recurrent_states |= nullrec_level1_states
+        level1_edges = self._get_level1_edges(direction).tocoo()
+        self._add_edges(level1_offset + level1_edges.row, level0_offset + level1_edges.col)
+
+    def _get_successor_nodes(self, node):
+        """
+        Returns the successors of a node, generated from the PTS transitions in the irregular part and from the
+        matrices B and C and the level 1 analysis in the regular parts.
+        """
+        label = self.get_label(node)
+        successors = []
+        if label[0] in self.regular_offsets:
+            direction, (level, i) = label
+            rmc = self.forward_rmc if direction == 'forward' else self.backward_rmc
+            level0_offset = self.regular_offsets[direction]
+            if level == 1:
+                level1_edges = self._get_level1_edges(direction)
+                row = level1_edges.indices[level1_edges.indptr[i]:level1_edges.indptr[i + 1]]
+                return (level0_offset + row).tolist()
+
+            for matrix, target_offset in ((rmc.B, level0_offset), (rmc.C, level0_offset + rmc.rmc_width)):
+                successors.extend((target_offset + matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]).tolist())
+            # Only the first max_jump columns of level 0 lead back to the irregular part
+            if i < self.pts.max_jump * self.pts.states_num:
+                for global_state_to, _ in self.pts.successors(rmc.get_global_state((0, i))):
+                    if self.is_irregular_value(global_state_to[1]):
+                        successors.append(self.get_node(global_state_to))
+            return successors
+
+        if not self.is_irregular_value(label[1]):
+            return self._get_far_initial_successors()
+        for global_state_to, _ in self.pts.successors(label):
+            if self.is_irregular_value(global_state_to[1]):
+                successors.append(self.get_node(global_state_to))
+            else:
+                direction = 'forward' if global_state_to[1] > 0 else 'backward'
+                rmc = self.forward_rmc if direction == 'forward' else self.backward_rmc
+                level, j = rmc.get_rmc_state(global_state_to)
+                if level == 0:
+                    successors.append(self.regular_offsets[direction] + j)
+        return successors
+
+    def _get_far_initial_successors(self):
+        """
+        Connects an initial state beyond the irregular part, which lies on some level l of a regular Markov chain.
+        By translation invariance, the phases in which the levels l - 1, l - 2, ... are first entered are
+        S_1, S_2, ... with S_0 = {i} and S_{k+1} = R[S_k], where R is the boolean reachability matrix. The initial
+        state is transient (null recurrent) if some phase of S_0, ..., S_{l-2} is transient (null recurrent) on
+        level 1, and its successors are the states of level 1 in the phases of S_{l-1}. The sequence of phase
+        sets is eventually periodic, so it is only followed until a set repeats.
+        """
+        direction = 'forward' if self.pts.init_val > 0 else 'backward'
+        rmc = self.forward_rmc if direction == 'forward' else self.backward_rmc
+        level, phase = rmc.get_rmc_state(self.initial_state)
+        level0_offset = self.regular_offsets[direction]
+        if level == 0:
+            return [level0_offset + phase]
+
+        level1_offset = level0_offset + rmc.rmc_width
+        reachability_matrix = self._get_level1_edges(direction)
+        phases, passed_phases, first_steps = frozenset([phase]), [], dict()
+        step = 0
+        while step < level - 1 and phases not in first_steps:
+            first_steps[phases] = step
+            passed_phases.append(phases)
+            phases = frozenset(reachability_matrix[sorted(phases)].indices.tolist())
+            step += 1
+        if step < level - 1:
+            cycle_start = first_steps[phases]
+            phases = passed_phases[cycle_start + (level - 1 - cycle_start) % (step - cycle_start)]
+
+        passed_phases = np.array(sorted(frozenset().union(*passed_phases)), dtype=np.int64)
+        # A phase that never leads one level down cannot reach the terminal state, just like a transient one
+        stuck = np.diff(reachability_matrix.indptr)[passed_phases] == 0
+        if self.transient_nodes[level1_offset + passed_phases].any() or stuck.any():
+            self.transient_nodes[self.initial_node] = True
+        if self.null_recurrent_nodes[level1_offset + passed_phases].any():
+            self.null_recurrent_nodes[self.initial_node] = True
+        logger.info("The initial state lies on level %d of the %s regular Markov chain.", level, direction)
+        return (level1_offset + np.array(sorted(phases), dtype=np.int64)).tolist()
+
+    def _explore_and_check(self):
+        """
+        Generates the nodes reachable from the initial state by a breadth-first search, which stops at the first
+        transient node and at the first node without successors other than the terminal state. If the search
+        completes, the explored nodes that cannot reach the terminal state are determined by a backward search.
+
+        :return: The verdict, the node that decided it or None, and the parent of every explored node. (tuple)
+        """
+        parents = {self.initial_node: self.initial_node}
+        queue = deque([self.initial_node])
+        sources, targets = [], []
+        deciding_node, null_recurrent_node = None, None
+        while queue:
+            node = queue.popleft()
+            # Generating the successors of a level 1 node analyzes its regular Markov chain
+            successors = self._get_successor_nodes(node)
+            if self.transient_nodes[node] or (not successors and node != self.terminal_node):
+                deciding_node = node
+                break
+            if null_recurrent_node is None and self.null_recurrent_nodes[node]:
+                null_recurrent_node = node
+            for successor in successors:
+                sources.append(node)
+                targets.append(successor)
+                if successor not in parents:
+                    parents[successor] = node
+                    queue.append(successor)
+        self._add_edges(sources, targets)
+        self._build_graph()
+        self.post_set = np.zeros(self.nodes_num, dtype=bool)
+        self.post_set[list(parents)] = True
+        logger.info("Explored %d of the %d states of the Labeled Markov Chain.", len(parents), self.nodes_num)
+        if deciding_node is not None:
+            return (False, False), deciding_node, parents
+
+        terminal_reachable_nodes = self.get_reachable_nodes(self.graph.T.tocsr(), self.terminal_node)
+        for node in parents:
+            if not terminal_reachable_nodes[node]:
+                return (False, False), node, parents
+        return (True, null_recurrent_node is None), null_recurrent_node, parents
+
+    def _check(self):
+        """
+        Determines the verdict on the whole graph from a breadth-first search from the initial state and a
+        backward search from the terminal state.
+
+        :return: The verdict, the node that decided it or None, and the parent of every node of the post set. (tuple)
+        """
+        order, parents = csgraph.breadth_first_order(self.graph, self.initial_node, directed=True,
+                                                     return_predecessors=True)
+        terminal_reachable_nodes = self.get_reachable_nodes(self.graph.T.tocsr(), self.terminal_node)
+        non_ast_nodes = order[(self.transient_nodes | ~terminal_reachable_nodes)[order]]
+        if non_ast_nodes.size > 0:
+            return (False, False), int(non_ast_nodes[0]), parents
+        null_recurrent_nodes = order[self.null_recurrent_nodes[order]]
+        if null_recurrent_nodes.size > 0:
+            return (True, False), int(null_recurrent_nodes[0]), parents
+        return (True, True), None, parents
+
+    def _get_witness(self, node, parents):
+        """
+        Returns the states on the search path from the initial state to a node.
+        """
+        path = [node]
+        while node != self.initial_node:
+            node = int(parents[node])
+            path.append(node)
+        return [self.get_label(path_node) for path_node in reversed(path)]
   
     def visualize(self, ifshow=False, file_path=None):
         try:
@@ -94,26 +387,19 @@ class LabeledMarkovChain:
 
         G = pgv.AGraph(strict=False, directed=True)
 
-        nodes_info = dict()
-        for node in self.post_set:
-            if node == self.initial_state:
-                nodes_info[node] = 'initial'
-            elif node == self.terminal_state:
-                nodes_info[node] = 'terminal'
+        post_nodes = np.flatnonzero(self.post_set)
+        for node in post_nodes.tolist():
+            label = self.get_label(node)
+            if node == self.initial_node:
+                G.add_node(label, color='green', style='filled')
+            elif node == self.terminal_node:
+                G.add_node(label, color='red', style='filled')
             else:
-                nodes_info[node] = 'normal'
+                G.add_node(label)
 
-        for node, info in nodes_info.items():
-            if info == 'initial':
-                G.add_node(node, color='green', style='filled')
-            elif info == 'terminal':
-                G.add_node(node, color='red', style='filled')
-            else:
-                G.add_node(node)
-
-        for edge in self.G.edges:
-            if edge[0] in self.post_set and edge[1] in self.post_set:
-                G.add_edge(edge[0], edge[1])
+        post_graph = self.graph[post_nodes][:, post_nodes].tocoo()
+        for i, j in zip(post_graph.row.tolist(), post_graph.col.tolist()):
+            G.add_edge(self.get_label(post_nodes[i]), self.get_label(post_nodes[j]))
 
         G.layout(prog='dot')
         if file_path is None:
@@ -128,22 +414,21 @@ class LabeledMarkovChain:
         return output_image_path
 
     def verify_post_set_reachability(self):
-        ternimal_reachable_states = nx.ancestors(self.G, self.terminal_state)
-        ternimal_reachable_states.add(self.terminal_state)
-        terminal_unreachable_states = set(self.G.nodes).difference(ternimal_reachable_states)
-
-        if self.post_set.intersection(terminal_unreachable_states | self.transient_states):
-            return False
-        return True
+        terminal_reachable_nodes = self.get_reachable_nodes(self.graph.T.tocsr(), self.terminal_node)
+        return not (self.post_set & (~terminal_reachable_nodes | self.transient_nodes)).any()
 
     def verify_reachability_to_null_recurrent_states(self):
-        if self.post_set.intersection(self.null_recurrent_states):
-            return True
-        else:
-            return False
+        return bool((self.post_set & self.null_recurrent_nodes).any())
 
     def is_ast_and_past(self):
-        if self.verify_post_set_reachability():
-            return {'ast': True, 'past': not self.verify_reachability_to_null_recurrent_states()}
-        else:
-            return {'ast': False, 'past': False}
+        """
+        Decides AST and PAST. The witness is the path from the initial state to the state that decided the
+        verdict: a transient state or one that cannot reach the terminal state if AST fails, a null recurrent
+        state if only PAST fails, and None if both hold.
+        """
+        (ast, past), deciding_node, parents = self._explore_and_check() if self.explore else self._check()
+        witness = None
+        if deciding_node is not None:
+            witness = self._get_witness(deciding_node, parents)
+            logger.info("The verdict AST=%s, PAST=%s is witnessed by a path to %s.", ast, past, witness[-1])
+        return {'ast': ast, 'past': past, 'witness': witness}
@@ -1,6 +1,8 @@
 from probably.pgcl import *
 from src.analysis.guard_analysis import *
+from src.models.transitions import TransitionStore
 from fractions import Fraction
+import sympy as sp
 import logging
 
 logger = logging.getLogger("pastry")
@@ -16,9 +18,8 @@ class ProbabilisticTransitionSystem:
         self.init_val = int(list(program.variables.values())[0])
         self.var_name = list(program.variables.keys())[0]
         self.states_num = 0
-        self.non_trivial_guards = []
         self.states_types_dict = dict()
-        self.states_transitions_dict = dict()
+        self.transitions = TransitionStore()
         
         # Recursively build the PTS block from the program's instructions
         exit_info_list, _ = self._build_block_from_subast(program.instructions)
@@ -33,6 +34,28 @@ class ProbabilisticTransitionSystem:
         
         logger.info("Probabilistic Transition System successfully created with %d states and %d transitions.", len(self.states_types_dict), len(self.states_transitions_dict))
     
+    @property
+    def states_transitions_dict(self):
+        """
+        Read-only view of the transitions in the form {(state_from, state_to): (transition, ...)}.
+        """
+        return self.transitions.pairs()
+
+    @property
+    def non_trivial_guards(self):
+        """
+        The distinct guards of the PTS that depend on the counter variable.
+        """
+        return [guard for guard in self.transitions.guards if guard.sp_expr.free_symbols]
+
+    @property
+    def max_jump(self):
+        """
+        The largest absolute counter update of a single transition.
+        """
+        updates = self.transitions.update
+        return int(abs(updates).max()) if len(updates) > 0 else 0
+
     def get_mc_transition_prob(self, mc_state_from, mc_state_to):
         """
         Computes the transition probability between two Markov Chain states.
@@ -50,6 +73,206 @@ class ProbabilisticTransitionSystem:
             else:
                 return 0
 
+    def successors(self, mc_state):
+        """
+        Yields the successors of a Markov Chain state together with their transition probabilities.
+
+        :param mc_state: A Markov Chain state of the form (pts_state, variable_value). (tuple)
+        :return: A generator of pairs ((pts_state, variable_value), (prob_num, prob_den)).
+        """
+        pts_state, variable_value = mc_state
+        for state_to, guard, prob_num, prob_den, update_value in self.transitions.outgoing(pts_state):
+            if guard.evaluate(variable_value):
+                yield (state_to, variable_value + update_value), (prob_num, prob_den)
+
+    def minimize(self):
+        """
+        Reduces the PTS to a probabilistic bisimulation quotient while preserving AST and PAST. Unsatisfiable
+        transitions are dropped, states whose outgoing transitions are unguarded and either they or all incoming
+        transitions leave the counter unchanged are bypassed, and bisimilar states are merged.
+        """
+        states_num_before = self.states_num
+        initial_state, terminal_state = 0, self.states_num - 1
+        transitions = [(state_from, state_to, guard, Fraction(prob_num, prob_den), update_value)
+                       for state_from, state_to, guard, prob_num, prob_den, update_value in self.transitions.records()
+                       if guard.sp_expr != sp.false]
+        transitions = self._merge_parallel_transitions(transitions)
+        transitions = self._bypass_silent_states(transitions, {initial_state, terminal_state})
+
+        # Build the quotient over the states that remain reachable from the initial state
+        reachable_states = {initial_state}
+        stack = [initial_state]
+        successors_dict = dict()
+        for transition in transitions:
+            successors_dict.setdefault(transition[0], []).append(transition[1])
+        while stack:
+            for state_to in successors_dict.get(stack.pop(), ()):
+                if state_to not in reachable_states:
+                    reachable_states.add(state_to)
+                    stack.append(state_to)
+        reachable_states.add(terminal_state)
+        transitions = [transition for transition in transitions if transition[0] in reachable_states]
+
+        block_of = self._compute_bisimulation_blocks(sorted(reachable_states), transitions, terminal_state)
+        representatives = dict()
+        for state in sorted(reachable_states):
+            representatives.setdefault(block_of[state], state)
+        blocks = sorted(representatives, key=lambda block: representatives[block])
+        block_index = {block: index for index, block in enumerate(blocks)}
+        states_types = [self.states_types_dict[representatives[block]] for block in blocks]
+        quotient_transitions = self._merge_parallel_transitions(
+            [(block_index[block_of[state_from]], block_index[block_of[state_to]], guard, prob, update_value)
+             for state_from, state_to, guard, prob, update_value in transitions
+             if representatives[block_of[state_from]] == state_from])
+
+        self._rebuild(states_types,
+                      [(state_from, state_to, guard, prob.numerator, prob.denominator, update_value)
+                       for state_from, state_to, guard, prob, update_value in quotient_transitions],
+                      block_index[block_of[terminal_state]])
+        logger.info("Probabilistic Transition System minimized from %d to %d states.", states_num_before, self.states_num)
+
+    def _merge_parallel_transitions(self, transitions):
+        """
+        Merges transitions between the same states with the same guard and update by adding their probabilities.
+        Two such transitions with complementary guards and equal probabilities are merged into an unguarded one.
+        """
+        merged = dict()
+        for state_from, state_to, guard, prob, update_value in transitions:
+            key = (state_from, state_to, guard.sp_expr, update_value)
+            if key in merged:
+                merged[key][1] += prob
+            else:
+                merged[key] = [guard, prob]
+
+        for key in list(merged):
+            if key not in merged:
+                continue
+            state_from, state_to, sp_expr, update_value = key
+            complement_key = (state_from, state_to, sp.Not(sp_expr), update_value)
+            if complement_key != key and complement_key in merged and merged[complement_key][1] == merged[key][1]:
+                prob = merged.pop(key)[1]
+                merged.pop(complement_key)
+                true_key = (state_from, state_to, sp.true, update_value)
+                if true_key in merged:
+                    merged[true_key][1] += prob
+                else:
+                    merged[true_key] = [GuardExpr('true'), prob]
+
+        return [(state_from, state_to, guard, prob, update_value)
+                for (state_from, state_to, _, update_value), (guard, prob) in merged.items()]
+
+    def _bypass_silent_states(self, transitions, protected_states):
+        """
+        Removes states whose outgoing transitions are all unguarded, provided that either all their outgoing or
+        all their incoming transitions leave the counter unchanged. Every path through such a state is replaced by
+        a single transition, so the jump bound of the PTS does not grow.
+        """
+        transitions_dict = dict(enumerate(transitions))
+        incoming, outgoing = dict(), dict()
+        for index, (state_from, state_to, _, _, _) in transitions_dict.items():
+            outgoing.setdefault(state_from, set()).add(index)
+            incoming.setdefault(state_to, set()).add(index)
+        next_index = len(transitions_dict)
+
+        worklist = [state for state in outgoing if state not in protected_states]
+        while worklist:
+            state = worklist.pop()
+            out_transitions = [transitions_dict[index] for index in outgoing.get(state, ())]
+            in_transitions = [transitions_dict[index] for index in incoming.get(state, ())]
+            if (state in protected_states or not out_transitions
+                    or any(transition[2].sp_expr != sp.true or transition[1] == state for transition in out_transitions)
+                    or not (all(transition[4] == 0 for transition in out_transitions)
+                            or all(transition[4] == 0 for transition in in_transitions))):
+                continue
+
+            for index in outgoing.pop(state, set()) | incoming.pop(state, set()):
+                state_from, state_to, _, _, _ = transitions_dict.pop(index)
+                outgoing.get(state_from, set()).discard(index)
+                incoming.get(state_to, set()).discard(index)
+
+            for state_from, _, guard, prob_in, update_in in in_transitions:
+                for _, state_to, _, prob_out, update_out in out_transitions:
+                    transitions_dict[next_index] = (state_from, state_to, guard, prob_in * prob_out, update_in + update_out)
+                    outgoing.setdefault(state_from, set()).add(next_index)
+                    incoming.setdefault(state_to, set()).add(next_index)
+                    next_index += 1
+                    worklist.append(state_from)
+                    worklist.append(state_to)
+
+        return self._merge_parallel_transitions(transitions_dict.values())
+
+    def _compute_bisimulation_blocks(self, states, transitions, terminal_state):
+        """
+        Computes the coarsest probabilistic bisimulation by partition refinement. Guards are compared syntactically.
+
+        :return: A dictionary mapping each state to the identifier of its block.
+        """
+        transitions_from = dict()
+        for state_from, state_to, guard, prob, update_value in transitions:
+            transitions_from.setdefault(state_from, []).append((state_to, guard.sp_expr, prob, update_value))
+
+        block_of = {state: int(state == terminal_state) for state in states}
+        blocks_num = len(set(block_of.values()))
+        while True:
+            signatures = dict()
+            for state in states:
+                aggregated = dict()
+                for state_to, sp_expr, prob, update_value in transitions_from.get(state, ()):
+                    key = (sp_expr, update_value, block_of[state_to])
+                    aggregated[key] = aggregated.get(key, 0) + prob
+                signatures[state] = (block_of[state], frozenset(aggregated.items()))
+
+            signature_ids = dict()
+            block_of = {state: signature_ids.setdefault(signatures[state], len(signature_ids)) for state in states}
+            if len(signature_ids) == blocks_num:
+                return block_of
+            blocks_num = len(signature_ids)
+
+    def limit_jump(self, jump_bound):
+        """
+        Splits every transition whose update exceeds the jump bound into a chain of 'assign' states,
+        each of which moves the counter by at most jump_bound.
+        """
+        max_jump = self.max_jump
+        if max_jump <= jump_bound:
+            return
+        logger.info("Splitting PTS updates larger than the jump bound %d (maximal update: %d).", jump_bound, max_jump)
+
+        states_types = [self.states_types_dict[state] for state in range(self.states_num)]
+        true_guard = GuardExpr('true')
+        split_transitions = []
+        for state_from, state_to, guard, prob_num, prob_den, update_value in self.transitions.records():
+            state_current = state_from
+            step = jump_bound if update_value > 0 else -jump_bound
+            while abs(update_value) > jump_bound:
+                state_mid = len(states_types)
+                states_types.append('assign')
+                split_transitions.append((state_current, state_mid, guard, prob_num, prob_den, step))
+                state_current, guard, prob_num, prob_den = state_mid, true_guard, 1, 1
+                update_value -= step
+            split_transitions.append((state_current, state_to, guard, prob_num, prob_den, update_value))
+        self._rebuild(states_types, split_transitions, self.states_num - 1)
+        logger.info("Probabilistic Transition System rebuilt with %d states and %d transitions.", len(self.states_types_dict), len(self.states_transitions_dict))
+
+    def _rebuild(self, states_types, transitions, terminal_state):
+        """
+        Replaces all states and transitions of the PTS, renumbering the states so that the terminal state comes last.
+
+        :param states_types: The type of every state. (list)
+        :param transitions: Tuples (state_from, state_to, guard, prob_num, prob_den, update_value). (list)
+        :param terminal_state: The index of the terminal state in states_types. (int)
+        """
+        order = [state for state in range(len(states_types)) if state != terminal_state] + [terminal_state]
+        renumbering = {state: index for index, state in enumerate(order)}
+
+        self.states_num = 0
+        self.states_types_dict = dict()
+        self.transitions = TransitionStore()
+        for state in order:
+            self._add_state(states_types[state])
+        for state_from, state_to, guard, prob_num, prob_den, update_value in transitions:
+            self._add_transition(renumbering[state_from], renumbering[state_to], guard, prob_num, prob_den, update_value)
+
     def _add_state(self, state_type):
         """
         Adds a new PTS state with the given type to the internal PTS state dictionary.
@@ -63,19 +286,9 @@ class ProbabilisticTransitionSystem:
 
     def _add_transition(self, state_from, state_to, guard, prob_num, prob_den, update_value):
         """
-        Creates a transition between two PTS states and updates the internal PTS transition dictionary.
+        Creates a transition between two PTS states and appends it to the PTS transition store.
         """
-        if guard.sp_expr.free_symbols:
-            self.non_trivial_guards.append(guard)
-            
-        if (state_from, state_to) in self.states_transitions_dict:
-            self.states_transitions_dict[(state_from, state_to)].append({'guard': guard, 'prob_num': prob_num,
-                                                                         'prob_den': prob_den,
-                                                                         'update_value': update_value})
-        else:
-            self.states_transitions_dict[(state_from, state_to)] = [{'guard': guard, 'prob_num': prob_num,
-                                                                     'prob_den': prob_den,
-                                                                     'update_value': update_value}]
+        self.transitions.append(state_from, state_to, guard, prob_num, prob_den, update_value)
 
     def _add_transition_from_info(self, exit_info, entry_info):
         """
@@ -99,18 +312,10 @@ class ProbabilisticTransitionSystem:
     
     def _build_block_from_assign_group(self, update_value):
         """
-        Builds a PTS block for a group of assignments.
+        Builds a PTS block for a group of assignments, i.e., a single state that updates the counter by their sum.
         """
-        exists = []
-        entries = []
-        sign = int(update_value > 0) - int(update_value < 0)
-        for index in range(abs(update_value)):
-            state_up = self._add_state('assign')
-            exists.append([(state_up, GuardExpr('true'), 1, 1, sign)])
-            entries.append((state_up,))
-            
-        self._build_edges(exists, entries)
-        return exists[-1], entries[0]
+        state_assign = self._add_state('assign')
+        return [(state_assign, GuardExpr('true'), 1, 1, update_value)], (state_assign,)
     
     def _build_edges(self, exits, entries):
         len_list = len(entries)
@@ -246,14 +451,13 @@ class ProbabilisticTransitionSystem:
             else:
                 G.add_node(node, label=label)
 
-        for (state_from, state_to), transitions_list in self.states_transitions_dict.items():
-            for transition in transitions_list:
-                if transition['prob_num'] % transition['prob_den'] == 0:
-                    prob = str(transition['prob_num'] // transition['prob_den'])
-                else:
-                    prob = f"{transition['prob_num']}/{transition['prob_den']}"
-                edge_label = f"Prob: {prob}\nGuard: {str(transition['guard'])}\nUpdate: {transition['update_value']}"
-                G.add_edge(state_from, state_to, label=edge_label)
+        for state_from, state_to, guard, prob_num, prob_den, update_value in self.transitions.records():
+            if prob_num % prob_den == 0:
+                prob = str(prob_num // prob_den)
+            else:
+                prob = f"{prob_num}/{prob_den}"
+            edge_label = f"Prob: {prob}\nGuard: {str(guard)}\nUpdate: {update_value}"
+            G.add_edge(state_from, state_to, label=edge_label)
 
         G.layout(prog='dot')
         if file_path is None:
@@ -1,7 +1,12 @@
+from collections import deque
 import numpy as np
-import networkx as nx
-import scipy.sparse as scip
-import sympy as sp
+from src.utils.project_utils import get_level_span
+from src.utils.sparse_rational import SparseRationalMatrix
+from src.models.abstract_chain import AbstractChain
+from src.utils.bitset_matrix import BitsetMatrix
+from src.analysis.stationary import estimate_stationary_drift, get_stationary_drift
+from src.analysis.qbd import solve_qbd_g_matrix
+from src.utils.analysis_cache import get_blocks_key
 import logging
 
 logger = logging.getLogger("pastry")
@@ -10,7 +15,7 @@ class RegularMarkovChain:
     """
     Represents the regular markov chain corresponding to a 1-d PCP.
     """
-    def __init__(self, pts, direction, threshold, period):
+    def __init__(self, pts, direction, threshold, period, graph_backend=None, cache=None):
         logger.info("Starting creation of Regular Markov Chain with '%s' direction.", direction)
         
         # Initialize class variables
@@ -21,17 +26,20 @@ class RegularMarkovChain:
         self.direction = direction
         self.threshold = threshold
         self.period = period
+        self.graph_backend = graph_backend
+        self.cache = cache
+        self._level1_info = None
         self.pts_states_num = self.pts.states_num
-        self.rmc_width = self.period * self.pts.states_num
+        self.level_span = get_level_span(self.pts.max_jump, self.period)
+        self.rmc_width = self.level_span * self.pts.states_num
         
         # Create transition probability matrices A, B, and C
-        level0_rmc_list = [self.get_global_state((0, i)) for i in range(self.rmc_width)]
-        level1_rmc_list = [self.get_global_state((1, i)) for i in range(self.rmc_width)]
-        self.A, self.A_nonzero_locs = self._create_prob_matrix(level1_rmc_list, level0_rmc_list)
-        self.B, self.B_nonzero_locs = self._create_prob_matrix(level1_rmc_list, level1_rmc_list)
-        self.C, self.C_nonzero_locs = self._create_prob_matrix(level0_rmc_list, level1_rmc_list)
+        self.A, self.B, self.C = self._create_prob_matrices()
+        self.A_nonzero_locs = self.A.nonzero_locs()
+        self.B_nonzero_locs = self.B.nonzero_locs()
+        self.C_nonzero_locs = self.C.nonzero_locs()
         
-        logger.info("Regular Markov Chain with direction '%s' successfully created. Each level contains %d states.", direction, self.rmc_width)
+        logger.info("Regular Markov Chain with direction '%s' successfully created. Each level spans %d counter values and contains %d states.", direction, self.level_span, self.rmc_width)
 
     def get_global_state(self, rmc_state):
         """
@@ -45,248 +53,242 @@ class RegularMarkovChain:
             variable_value = -1 * (self.threshold + 1 + multiple)
         return remainder, variable_value
 
-    def _create_prob_matrix(self, from_global_state_list, to_global_state_list):
+    def get_rmc_state(self, global_state):
         """
-        Creates a transition probability matrix.
+        Converts a global state to the regular Markov chain state, i.e., the inverse of get_global_state.
+        States below the first level of the regular part are mapped to negative levels.
         """
-        nonzero_locs = set()
-        re_matrix = np.zeros((self.rmc_width, self.rmc_width), dtype=object)
-        for i in range(self.rmc_width):
-            for j in range(self.rmc_width):
-                prob = self.pts.get_mc_transition_prob(from_global_state_list[i], to_global_state_list[j])
-                if prob:
-                    nonzero_locs.add((i, j))
-                    re_matrix[i, j] = prob
-        return re_matrix, nonzero_locs
-        
-    def get_boolean_reachability_matrix(self):
+        pts_state, variable_value = global_state
+        if self.direction == 'forward':
+            multiple = variable_value - self.threshold - 1
+        else:
+            multiple = -variable_value - self.threshold - 1
+        return divmod(multiple * self.pts_states_num + pts_state, self.rmc_width)
+
+    def _create_prob_matrices(self):
         """
-        Calculates boolean reachability matrix using sparse matrix operations.
-        Returns dense boolean matrix for compatibility.
+        Creates the transition probability matrices A, B and C from the PTS transitions in a single pass.
+        The sources are the states of level 1, whose successors lie on levels 0, 1 and 2, respectively.
+        Since a level spans a multiple of the period, the guards are evaluated on level 1 only.
         """
-        # Convert to sparse CSR format with binary values
-        A = scip.csr_matrix(self.A != 0, dtype=bool)
-        B = scip.csr_matrix(self.B != 0, dtype=bool)
-        C = scip.csr_matrix(self.C != 0, dtype=bool)
-
-        # Initialize reachability matrices
-        shape = (self.rmc_width, self.rmc_width)
-        re_old = scip.csr_matrix(shape, dtype=bool)
-        re_new = scip.csr_matrix(shape, dtype=bool)
-
-        while True:
-            # Compute terms using sparse matrix multiplication
-            B_term = B @ re_new
-            C_term = C @ (re_new @ re_new)
-            
-            # Sparse element-wise OR using max() operation
-            new_re = A.maximum(B_term).maximum(C_term)
-
-            # Check for convergence using sparse matrix comparison
-            if (new_re != re_old).nnz == 0:
-                return new_re.toarray()  # Return dense array for compatibility
+        transitions = self.pts.transitions
+        sign = 1 if self.direction == 'forward' else -1
+        offsets = np.arange(self.level_span)
+        level1_values = sign * (self.threshold + 1 + self.level_span + offsets)
+        guards_values = np.array([guard.evaluate_array(level1_values) for guard in transitions.guards],
+                                 dtype=bool).reshape(len(transitions.guards), self.level_span)
 
-            # Update for next iteration
-            re_old, re_new = re_new, new_re
+        # Entry (t, k) of the following arrays describes transition t taken at counter offset k of level 1
+        enabled = guards_values[transitions.guard_id]
+        rows = offsets * self.pts_states_num + transitions.source[:, None]
+        targets = ((self.level_span + offsets + sign * transitions.update[:, None]) * self.pts_states_num
+                   + transitions.target[:, None])
+        levels, columns = np.divmod(targets, self.rmc_width)
+        indices = np.broadcast_to(np.arange(len(transitions))[:, None], enabled.shape)
 
-    def get_approximate_reachability_matrix(self, tol=1e-8, max_iter=50000):
+        prob_nums, prob_dens = transitions.prob_num.tolist(), transitions.prob_den.tolist()
+        entries = [[] for _ in range(3)]
+        for index, i, level, j in zip(indices[enabled].tolist(), rows[enabled].tolist(),
+                                      levels[enabled].tolist(), columns[enabled].tolist()):
+            entries[level].append((i, j, prob_nums[index], prob_dens[index]))
+        return [SparseRationalMatrix.from_entries((self.rmc_width, self.rmc_width), level_entries)
+                for level_entries in entries]
+        
+    def get_boolean_reachability_matrix(self):
         """
-        Computes approximate reachability matrix.
+        Calculates the boolean reachability matrix R, i.e., the least fixed point of R = A | B R | C R R, by
+        semi-naive evaluation on bitset rows: every round only derives the entries that follow from the entries
+        added in the previous round. S = R R is maintained alongside R.
+
+        :return: Entry (i, j) is set if state j of level 0 is reachable from state i of level 1. (BitsetMatrix)
         """
-        # Convert to numpy matrix with float values
-        A_float = self.hybrid_to_float_matrix(self.A)
-        B_float = self.hybrid_to_float_matrix(self.B)
-        C_float = self.hybrid_to_float_matrix(self.C)
+        A = self.A.to_bool()
+        B = self.B.to_bool()
+        C = self.C.to_bool()
 
-        re_new = np.zeros_like(A_float)
-        for iteration in range(max_iter):
-            re_next = A_float + B_float @ re_new + C_float @ (re_new @ re_new)
-            if np.linalg.norm(re_next - re_new) < tol:
-                print(f"Converged after {iteration + 1} iterations.")
-                return re_next
-            re_new = re_next
-        logger.warning("Maximum number of iterations (%d) reached without convergence.", max_iter)
-        print("Warning: Maximum number of iterations reached without convergence.")
-        return re_new
+        reachability = BitsetMatrix.from_csr(A)
+        squared = BitsetMatrix.zeros(reachability.shape)
+        delta = reachability
+        while delta.any():
+            # New entries of R R have a new entry in their first or their second factor
+            delta_rows = delta.nonzero_rows()
+            delta_squared = BitsetMatrix.product(delta, reachability) | \
+                BitsetMatrix.product(reachability.select_columns(delta_rows), delta)
+            delta_squared = delta_squared.difference(squared)
+            squared = squared | delta_squared
 
-    def hybrid_to_float_matrix(self, hybrid_matrix):
-        """
-        Convert a hybrid component numpy matrix to a float numpy matrix.
-        """
-        float_matrix = np.zeros(hybrid_matrix.shape, dtype=float)
-        for i in range(hybrid_matrix.shape[0]):
-            for j in range(hybrid_matrix.shape[1]):
-                element = hybrid_matrix[i, j]
-                if element == 0:
-                    float_matrix[i, j] = 0.0
-                else:
-                    numerator, denominator = element
-                    float_matrix[i, j] = numerator / denominator
-        return float_matrix
+            delta = (BitsetMatrix.product(B, delta) | BitsetMatrix.product(C, delta_squared)).difference(reachability)
+            reachability = reachability | delta
+        return reachability
 
-    def hybrid_to_sympy_rational(self, hybrid_matrix):
+    def get_approximate_reachability_matrix(self, tol=1e-8, max_iter=50000, method='logarithmic_reduction'):
         """
-        Convert a hybrid component numpy matrix to a rational sympy matrix.
+        Computes the approximate reachability matrix, i.e., the minimal nonnegative solution G of the
+        quasi-birth-death equation G = A + B G + C G G. Entry (i, j) of G is the probability of reaching state j
+        of level 0 from state i of level 1.
+
+        :param method: The QBD solver, one of 'logarithmic_reduction', 'cyclic_reduction', 'newton' and 'functional'.
         """
-        rows, cols = hybrid_matrix.shape
-        sympy_matrix = []
-        
-        for i in range(rows):
-            row = []
-            for j in range(cols):
-                element = hybrid_matrix[i, j]
-                if element == 0:
-                    row.append(sp.Rational(0))
-                else:
-                    numerator, denominator = element
-                    row.append(sp.Rational(numerator, denominator))
-            sympy_matrix.append(row)
-        return sp.Matrix(sympy_matrix)
+        G, _, _ = solve_qbd_g_matrix(self.A.to_float(), self.B.to_float(), self.C.to_float(), method, tol, max_iter)
+        return G
 
-    def _get_bscc_category(self, bscc, ac_matrix):
+    def _get_bscc_category(self, bscc, abstract_chain):
         """
-        Determines the category of the bottom strongly connected component by calculating its steady-state distribution.
+        Determines the category of the bottom strongly connected component by the sign of the drift of its
+        steady-state distribution. The drift is computed in floating point first, and exactly only if its
+        sign is not certain within the error bound.
         """
-        size = len(bscc)
-
         # Directly return the result for a BSCC with only one state
-        if size == 1:
+        if len(bscc) == 1:
             return bscc[0] // self.rmc_width
 
-        # Extract the submatrix of the adjacency matrix corresponding to the BSCC
-        hybrid_matrix = ac_matrix[np.ix_(bscc, bscc)]
+        transition_matrix = abstract_chain.submatrix(bscc)
+        steps = [state // self.rmc_width - 1 for state in bscc]
+        drift, error_bound = estimate_stationary_drift(transition_matrix, steps)
+        if abs(drift) <= error_bound:
+            logger.debug("Drift %g of a BSCC with %d states is within the error bound %g, solving exactly.", drift, len(bscc), error_bound)
+            drift = get_stationary_drift(transition_matrix, steps)
+        if drift > 0:
+            return 2
+        elif drift < 0:
+            return 0
+        else:
+            return 1
 
-        # Convert hybrid matrix to a rational transition matrix
-        transition_matrix = self.hybrid_to_sympy_rational(hybrid_matrix)
+    def _get_column_masks(self, matrix):
+        """
+        Returns, for every column j of a boolean matrix, the bitset of the rows i with matrix[i, j].
+        """
+        masks = [0] * self.rmc_width
+        coo_matrix = matrix.tocoo()
+        for i, j in zip(coo_matrix.row.tolist(), coo_matrix.col.tolist()):
+            masks[j] |= 1 << i
+        return masks
 
-        # Set up the system of equations for the steady-state distribution
-        pi_symbols = sp.symbols(f'pi0:{size}')
-        pi_vector = sp.Matrix(pi_symbols)
-        equations = [sp.Eq(sum(pi_vector[j] * transition_matrix[j, i] for j in range(size)), pi_vector[i]) for i in
-                     range(size)]
-        equations.append(sp.Eq(sum(pi_vector), 1))
-        solution = sp.solve(equations, pi_symbols, dict=True)
+    def _get_runway_closure(self, targets, max_level, masks):
+        """
+        Computes the runway nodes that can reach one of the target nodes. Every level is a bitset over the
+        states of the level, and newly found nodes are propagated to their predecessors until a fixed point.
 
-        if len(solution) > 1:
-            logger.error("Multiple solutions found for steady-state distribution. Expected a unique solution.")
-            raise ValueError("Multiple solutions found, expected a unique solution.")
+        :param targets: The bitsets of the target nodes on the levels 0 to max_level. (list)
+        :param masks: The column masks of the matrices A, B, C and R. (tuple)
+        :return: The bitsets of the nodes that can reach a target node, including the targets. (list)
+        """
+        A_masks, B_masks, C_masks, R_masks = masks
+        closure = list(targets)
+        worklist = deque((level, bits) for level, bits in enumerate(targets) if bits)
+        while worklist:
+            level, delta = worklist.popleft()
 
-        if solution:
-            stationary_distribution = [solution[0][pi_symbols[i]] for i in range(size)]
+            # B-edges come from the same level, A-edges from the level above, C-edges from the level below
+            # (except from level 0), and the edges given by R from the last level to the one below it
+            predecessors = [(level, B_masks)]
+            if level < max_level:
+                predecessors.append((level + 1, A_masks))
+            if level >= 2:
+                predecessors.append((level - 1, C_masks))
+            if level == max_level - 1:
+                predecessors.append((max_level, R_masks))
 
-            # Calculate left and right transition trends
-            left_transition_trend = 0
-            right_transition_trend = 0
-            for i, state in enumerate(bscc):
-                ac_level = state // self.rmc_width
-                if ac_level == 0:
-                    left_transition_trend += stationary_distribution[i]
-                if ac_level == 2:
-                    right_transition_trend += stationary_distribution[i]
-            if left_transition_trend < right_transition_trend:
-                return 2
-            elif left_transition_trend > right_transition_trend:
-                return 0
-            else:
-                return 1
-        else:
-            logger.error("No solution found for the stationary distribution.")
-            raise ValueError("No solution found for the stationary distribution.")
+            states = []
+            while delta:
+                lowest = delta & -delta
+                states.append(lowest.bit_length() - 1)
+                delta ^= lowest
+            for predecessor_level, column_masks in predecessors:
+                found = 0
+                for j in states:
+                    found |= column_masks[j]
+                found &= ~closure[predecessor_level]
+                if found:
+                    closure[predecessor_level] |= found
+                    worklist.append((predecessor_level, found))
+        return closure
 
     def _analyze_runway(self, max_level):
         """
-        Constructs and analyzes the runway to identify trap states and exit states.
+        Analyzes the runway, i.e., levels 0 to max_level of the regular Markov chain where the last level is
+        summarized by the boolean reachability matrix, to identify trap states and exit states. Trap nodes can
+        reach neither barrier; a level-1 state is trapped if it can reach a trap node, and exits if it is not
+        trapped and cannot reach the right barrier.
         """
-        runway = nx.DiGraph()
-        level1_nodes = {(1, i) for i in range(self.rmc_width)}
-        left_barrier = {(0, i) for i in range(self.rmc_width)}
-        right_barrier = {(max_level, i) for i in range(self.rmc_width)}
-        runway.add_nodes_from(level1_nodes)
-        runway.add_nodes_from(left_barrier)
-        runway.add_nodes_from(right_barrier)
-
-        #construct runway
-        for i, j in self.A_nonzero_locs:
-            for k in range(0, max_level):
-                runway.add_edge((k + 1, i), (k, j))
-                
-        for i, j in self.B_nonzero_locs:
-            for k in range(0, max_level + 1):
-                runway.add_edge((k, i), (k, j))
-                
-        for i, j in self.C_nonzero_locs:
-            for k in range(1, max_level):
-                runway.add_edge((k, i), (k + 1, j))
-        
         boolean_reachability_matrix = self.get_boolean_reachability_matrix()
-        source_nodes = [(max_level, i) for i in range(self.rmc_width)]
-        target_nodes = [(max_level - 1, j) for j in range(self.rmc_width)]
-        edges = {(source_nodes[i], target_nodes[j]) for i in range(self.rmc_width) for j in range(self.rmc_width) if
-                 boolean_reachability_matrix[i, j]}
-        runway.add_edges_from(edges)
-        
-        trap_nodes = set(runway.nodes)
-        for node in left_barrier:
-            runway.add_edge(node, 'left_fake')
-        for node in right_barrier:
-            runway.add_edge(node, 'right_fake')
-        left_barrier_ancestors = nx.ancestors(runway, 'left_fake')
-        right_barrier_ancestors = nx.ancestors(runway, 'right_fake')
-        trap_nodes = trap_nodes - left_barrier_ancestors - right_barrier_ancestors
-        runway.remove_nodes_from(['left_fake', 'right_fake'])
+        masks = tuple(self._get_column_masks(matrix) for matrix in
+                      (self.A.to_bool(), self.B.to_bool(), self.C.to_bool(), boolean_reachability_matrix.to_csr()))
+
+        full_level = (1 << self.rmc_width) - 1
+        left_barrier = [full_level] + [0] * max_level
+        right_barrier = [0] * max_level + [full_level]
+        can_reach_left = self._get_runway_closure(left_barrier, max_level, masks)
+        can_reach_right = self._get_runway_closure(right_barrier, max_level, masks)
+        trap_nodes = [full_level & ~(left | right) for left, right in zip(can_reach_left, can_reach_right)]
+        can_reach_trap = self._get_runway_closure(trap_nodes, max_level, masks)
 
         trapped_level1_states, exit_level1_states = set(), set()
-        for node in level1_nodes:
-            reachable_nodes = nx.descendants(runway, node) | {node}
-            if reachable_nodes & trap_nodes:
-                trapped_level1_states.add((self.direction, node))
-            elif not (reachable_nodes & right_barrier):
-                exit_level1_states.add((self.direction, node))
+        for i in range(self.rmc_width):
+            if can_reach_trap[1] >> i & 1:
+                trapped_level1_states.add((self.direction, (1, i)))
+            elif not can_reach_right[1] >> i & 1:
+                exit_level1_states.add((self.direction, (1, i)))
         return trapped_level1_states, exit_level1_states, boolean_reachability_matrix
 
+    def _get_scc_categories(self, sccs, abstract_chain):
+        """
+        Determines the category of every state of the abstract chain, i.e., the maximal category of the bottom
+        strongly connected components reachable from it. The categories are propagated over the condensation
+        in a single pass in reverse topological order.
+
+        :return: The category of every state of the abstract chain. (numpy.ndarray)
+        """
+        scc_of = np.empty(abstract_chain.states_num, dtype=np.int64)
+        for index, scc in enumerate(sccs):
+            scc_of[scc] = index
+
+        # Edges of the condensation, grouped by their target
+        sources, targets = abstract_chain.edges()
+        sources, targets = scc_of[sources], scc_of[targets]
+        crossing = sources != targets
+        edges = np.unique(np.stack([targets[crossing], sources[crossing]], axis=1), axis=0).reshape(-1, 2)
+        predecessors_indptr = np.searchsorted(edges[:, 0], np.arange(len(sccs) + 1)).tolist()
+        predecessors = edges[:, 1].tolist()
+        out_degrees = np.bincount(edges[:, 1], minlength=len(sccs)).tolist()
+
+        categories = [0] * len(sccs)
+        worklist = [index for index in range(len(sccs)) if out_degrees[index] == 0]
+        for index in worklist:
+            categories[index] = self._get_bscc_category(sccs[index], abstract_chain)
+        while worklist:
+            index = worklist.pop()
+            for predecessor in predecessors[predecessors_indptr[index]:predecessors_indptr[index + 1]]:
+                categories[predecessor] = max(categories[predecessor], categories[index])
+                out_degrees[predecessor] -= 1
+                if out_degrees[predecessor] == 0:
+                    worklist.append(predecessor)
+        return np.array(categories)[scc_of]
+
     def get_level1_info(self):
         """
         Determines level1 states info based on the coupled markov chain and runway analysis.
+        The result is computed once and reused by later calls. As it only depends on the blocks A, B and C,
+        it is also looked up in and stored to the analysis cache, if one is given.
         """
+        if self._level1_info is not None:
+            return self._level1_info
+        if self.cache is not None:
+            cache_key = get_blocks_key(self.A, self.B, self.C)
+            cached_info = self.cache.get(cache_key)
+            if cached_info is not None:
+                transient_states, nullrec_states, boolean_reachability_matrix = cached_info
+                self._level1_info = ({(self.direction, (1, state)) for state in transient_states},
+                                     {(self.direction, (1, state)) for state in nullrec_states},
+                                     boolean_reachability_matrix)
+                return self._level1_info
         logger.info("Starting the analysis of Regular Markov Chain with direction: %s.", self.direction)
 
-        ac_matrix = np.block([[self.A, self.B, self.C], [self.A, self.B, self.C], [self.A, self.B, self.C]])
-        abstract_chain = nx.from_numpy_array(ac_matrix != 0, create_using=nx.DiGraph())
-        sccs = [list(scc) for scc in nx.strongly_connected_components(abstract_chain)]
-
-        condensed_graph = nx.DiGraph()
-        condensed_graph.add_nodes_from(range(len(sccs)))
-        node_to_scc = {}
-        for idx, scc in enumerate(sccs):
-            for node in scc:
-                node_to_scc[node] = idx
-                
-        # Process each edge to determine SCC connections
-        for u, v in abstract_chain.edges():
-            i = node_to_scc[u]
-            j = node_to_scc[v]
-            if i != j:
-                condensed_graph.add_edge(i, j)
-
-        bottom_sccs_nodes_categories = dict()
-        for node in condensed_graph.nodes:
-            if condensed_graph.out_degree(node) == 0:
-                bottom_sccs_nodes_categories[node] = self._get_bscc_category(sccs[node], ac_matrix)
+        abstract_chain = AbstractChain(self.A, self.B, self.C, self.graph_backend)
+        sccs = abstract_chain.strongly_connected_components()
 
-        axis_acstates_categories = {key: 0 for key in range(self.rmc_width)}
-        for i in range(len(sccs)):
-            if i in bottom_sccs_nodes_categories:
-                bottom_category = bottom_sccs_nodes_categories[i]
-                for acstate in sccs[i]:
-                    if acstate < self.rmc_width:
-                        axis_acstates_categories[acstate] = max(axis_acstates_categories[acstate], bottom_category)
-            else:
-                for bottom_node, bottom_category in bottom_sccs_nodes_categories.items():
-                    if nx.has_path(condensed_graph, i, bottom_node):
-                        for acstate in sccs[i]:
-                            if acstate < self.rmc_width:
-                                axis_acstates_categories[acstate] = max(axis_acstates_categories[acstate],
-                                                                        bottom_category)
+        axis_acstates_categories = dict(enumerate(self._get_scc_categories(sccs, abstract_chain)[:self.rmc_width].tolist()))
                                 
         logger.info("Starting runway analysis. Total runway states to be analyzed: %d.", 3 * self.rmc_width * self.rmc_width)
         
@@ -307,4 +309,10 @@ class RegularMarkovChain:
                     nullrec_level1_states.add(rmc_state)
                     
         logger.info("Completed the analysis of Regular Markov Chain with direction: %s.", self.direction)
-        return transient_level1_states, nullrec_level1_states, boolean_reachability_matrix
+        self._level1_info = (transient_level1_states, nullrec_level1_states, boolean_reachability_matrix)
+        if self.cache is not None:
+            # The cached states omit the direction, so that both directions can share an entry
+            self.cache.put(cache_key, (sorted(state for _, (_, state) in transient_level1_states),
+                                       sorted(state for _, (_, state) in nullrec_level1_states),
+                                       boolean_reachability_matrix))
+        return self._level1_info
@@ -0,0 +1,136 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+import numpy as np
+from src.utils.sparse_rational import to_int_array
+
+
+COLUMNS = ('source', 'target', 'update', 'prob_num', 'prob_den', 'guard_id')
+
+
+class TransitionStore:
+    """
+    Columnar storage of the transitions of a probabilistic transition system. Transition k moves from
+    state source[k] to state target[k] with probability prob_num[k] / prob_den[k] if the guard
+    guards[guard_id[k]] holds, and changes the counter by update[k]. Equal guards share one guard id.
+    """
+    def __init__(self):
+        self.guards = []
+        self._guard_ids = dict()
+        self._pending = []
+        self._columns = {name: np.empty(0, dtype=np.int64) for name in COLUMNS}
+        self._outgoing = None
+        self._pairs = None
+
+    def __len__(self):
+        return len(self._columns['source']) + len(self._pending)
+
+    def __getstate__(self):
+        # The per-state index and the read-only view are caches that are rebuilt on demand
+        self._flush()
+        state = self.__dict__.copy()
+        state['_outgoing'] = None
+        state['_pairs'] = None
+        return state
+
+    def append(self, state_from, state_to, guard, prob_num, prob_den, update_value):
+        """
+        Adds a transition to the store.
+        """
+        guard_id = self._guard_ids.get(guard.sp_expr)
+        if guard_id is None:
+            guard_id = len(self.guards)
+            self._guard_ids[guard.sp_expr] = guard_id
+            self.guards.append(guard)
+        self._pending.append((state_from, state_to, update_value, prob_num, prob_den, guard_id))
+        self._outgoing = None
+        self._pairs = None
+
+    def _flush(self):
+        """
+        Moves the transitions appended since the last access into the column arrays.
+        """
+        if self._pending:
+            for name, values in zip(COLUMNS, zip(*self._pending)):
+                self._columns[name] = to_int_array(self._columns[name].tolist() + list(values))
+            self._pending = []
+
+    def column(self, name):
+        """
+        Returns one of the columns 'source', 'target', 'update', 'prob_num', 'prob_den' or 'guard_id'.
+        """
+        self._flush()
+        return self._columns[name]
+
+    @property
+    def source(self):
+        return self.column('source')
+
+    @property
+    def target(self):
+        return self.column('target')
+
+    @property
+    def update(self):
+        return self.column('update')
+
+    @property
+    def prob_num(self):
+        return self.column('prob_num')
+
+    @property
+    def prob_den(self):
+        return self.column('prob_den')
+
+    @property
+    def guard_id(self):
+        return self.column('guard_id')
+
+    def records(self):
+        """
+        Yields every transition as a tuple (state_from, state_to, guard, prob_num, prob_den, update_value).
+        """
+        self._flush()
+        for state_from, state_to, update_value, prob_num, prob_den, guard_id in zip(
+                *(self._columns[name].tolist() for name in COLUMNS)):
+            yield state_from, state_to, self.guards[guard_id], prob_num, prob_den, update_value
+
+    def outgoing(self, state):
+        """
+        Returns the transitions leaving a state as tuples (state_to, guard, prob_num, prob_den, update_value).
+        """
+        if self._outgoing is None:
+            self._outgoing = dict()
+            for state_from, state_to, guard, prob_num, prob_den, update_value in self.records():
+                self._outgoing.setdefault(state_from, []).append((state_to, guard, prob_num, prob_den, update_value))
+        return self._outgoing.get(state, ())
+
+    def pairs(self):
+        """
+        Returns a read-only view that maps (state_from, state_to) pairs to their transitions.
+        """
+        if self._pairs is None:
+            self._pairs = TransitionDictView(self)
+        return self._pairs
+
+
+class TransitionDictView(Mapping):
+    """
+    Read-only view of a TransitionStore in the form {(state_from, state_to): (transition, ...)}, where each
+    transition is a read-only dictionary with the keys 'guard', 'prob_num', 'prob_den' and 'update_value'.
+    """
+    def __init__(self, store):
+        self._transitions = dict()
+        for state_from, state_to, guard, prob_num, prob_den, update_value in store.records():
+            transition = MappingProxyType({'guard': guard, 'prob_num': prob_num, 'prob_den': prob_den,
+                                           'update_value': update_value})
+            self._transitions.setdefault((state_from, state_to), []).append(transition)
+        self._transitions = {pair: tuple(transitions) for pair, transitions in self._transitions.items()}
+
+    def __getitem__(self, pair):
+        return self._transitions[pair]
+
+    def __iter__(self):
+        return iter(self._transitions)
+
+    def __len__(self):
+        return len(self._transitions)
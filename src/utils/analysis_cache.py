@@ -0,0 +1,121 @@
+import hashlib
+import math
+import os
+import pickle
+import tempfile
+import logging
+
+logger = logging.getLogger("pastry")
+
+# Incremented whenever the format or the meaning of the cached results changes
+CACHE_VERSION = 1
+
+
+def _update_with_matrix(digest, matrix):
+    """
+    Feeds a canonical encoding of a sparse rational matrix into a hash. Every row is divided by the gcd of its
+    numerators and its denominator, so equal matrices are encoded equally regardless of the stored denominators.
+    """
+    digest.update(repr(matrix.shape).encode())
+    indptr = [int(position) for position in matrix.indptr.tolist()]
+    indices = [int(index) for index in matrix.indices.tolist()]
+    numerators = matrix.numerators.tolist()
+    denominators = matrix.denominators.tolist()
+    rows = []
+    for i in range(matrix.shape[0]):
+        row_numerators = [int(numerator) for numerator in numerators[indptr[i]:indptr[i + 1]]]
+        denominator = int(denominators[i])
+        divisor = math.gcd(denominator, *row_numerators) or 1
+        entries = ','.join(f"{j}:{numerator // divisor}"
+                           for j, numerator in zip(indices[indptr[i]:indptr[i + 1]], row_numerators))
+        rows.append(f"{entries}/{denominator // divisor}")
+    digest.update(';'.join(rows).encode())
+
+
+def get_blocks_key(A, B, C):
+    """
+    Returns the hexadecimal SHA-256 digest that identifies the blocks A, B and C of a regular Markov chain.
+    """
+    digest = hashlib.sha256(f"pastry-level1-v{CACHE_VERSION}".encode())
+    for matrix in (A, B, C):
+        digest.update(b'|')
+        _update_with_matrix(digest, matrix)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent cache of analysis results in a directory, with one pickle file per key. The cache is bounded by
+    the total size of its files, and the least recently used entries are evicted first, where the modification
+    time of a file records its last use.
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Returns the value stored under a key, or None if the key is not in the cache or its entry is unreadable.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            logger.debug("Analysis cache miss for key %s.", key)
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+            logger.warning("Discarding unreadable analysis cache entry %s (%s).", path, error)
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        logger.info("Analysis cache hit for key %s.", key)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value under a key, replacing the file atomically, and evicts entries beyond the size bound.
+        """
+        try:
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self._path(key))
+        except OSError as error:
+            logger.warning("Could not write analysis cache entry for key %s (%s).", key, error)
+            return
+        self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the total size is within the bound.
+        """
+        entries = []
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.debug("Evicting analysis cache entry %s.", path)
+            self._remove(path)
+            total -= size
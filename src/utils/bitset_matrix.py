@@ -0,0 +1,116 @@
+import numpy as np
+import scipy.sparse as scip
+
+
+class BitsetMatrix:
+    """
+    Boolean matrix whose rows are packed into bitsets of 64-bit words. Bit j of row i is stored in
+    bit j % 8 of byte j // 8 of the row, so the words are only combined bitwise and never read as integers.
+    """
+    def __init__(self, words, columns):
+        self.words = words
+        self.shape = (words.shape[0], columns)
+
+    @classmethod
+    def zeros(cls, shape):
+        return cls(np.zeros((shape[0], -(-shape[1] // 64)), dtype=np.uint64), shape[1])
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """
+        Packs a dense boolean array.
+        """
+        matrix = np.asarray(matrix, dtype=bool)
+        rows, columns = matrix.shape
+        packed = np.zeros((rows, 8 * -(-columns // 64)), dtype=np.uint8)
+        packed[:, :-(-columns // 8)] = np.packbits(matrix, axis=1, bitorder='little')
+        return cls(packed.view(np.uint64), columns)
+
+    @classmethod
+    def from_csr(cls, matrix):
+        """
+        Packs the sparsity pattern of a SciPy sparse matrix.
+        """
+        coo_matrix = scip.coo_matrix(matrix)
+        rows, columns = coo_matrix.shape
+        nonzero = coo_matrix.data != 0
+        packed = np.zeros((rows, 8 * -(-columns // 64)), dtype=np.uint8)
+        np.bitwise_or.at(packed, (coo_matrix.row[nonzero], coo_matrix.col[nonzero] // 8),
+                         np.left_shift(1, coo_matrix.col[nonzero] % 8).astype(np.uint8))
+        return cls(packed.view(np.uint64), columns)
+
+    def to_dense(self):
+        bits = np.unpackbits(self.words.view(np.uint8), axis=1, bitorder='little')
+        return bits[:, :self.shape[1]].astype(bool)
+
+    def nonzero(self):
+        """
+        Returns the row and column indices of the set bits.
+        """
+        rows = np.flatnonzero(self.words.any(axis=1))
+        if rows.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        bits = np.unpackbits(self.words[rows].view(np.uint8), axis=1, bitorder='little')[:, :self.shape[1]]
+        sub_rows, columns = np.nonzero(bits)
+        return rows[sub_rows], columns
+
+    def to_csr(self):
+        """
+        Returns the matrix as a boolean SciPy CSR matrix.
+        """
+        rows, columns = self.nonzero()
+        return scip.csr_matrix((np.ones(rows.size, dtype=bool), (rows, columns)), shape=self.shape)
+
+    @property
+    def nnz(self):
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+    def any(self):
+        return bool(self.words.any())
+
+    def nonzero_rows(self):
+        """
+        Returns a boolean array that marks the rows with at least one set bit.
+        """
+        return self.words.any(axis=1)
+
+    def select_columns(self, columns_mask):
+        """
+        Returns the matrix restricted to the columns marked by a boolean array.
+        """
+        return BitsetMatrix(self.words & BitsetMatrix.from_dense(columns_mask[None, :]).words, self.shape[1])
+
+    def __or__(self, other):
+        return BitsetMatrix(self.words | other.words, self.shape[1])
+
+    def __and__(self, other):
+        return BitsetMatrix(self.words & other.words, self.shape[1])
+
+    def difference(self, other):
+        """
+        Returns the entries set in this matrix but not in the other one.
+        """
+        return BitsetMatrix(self.words & ~other.words, self.shape[1])
+
+    def __eq__(self, other):
+        return self.shape == other.shape and np.array_equal(self.words, other.words)
+
+    @staticmethod
+    def product(left, right):
+        """
+        Computes the boolean matrix product of a sparse boolean matrix and a bitset matrix, i.e., row i of the
+        result is the union of the rows j of the right matrix with left[i, j].
+
+        :param left: The left factor as a SciPy sparse matrix or a bitset matrix.
+        :param right: The right factor. (BitsetMatrix)
+        """
+        if isinstance(left, BitsetMatrix):
+            left = left.to_csr()
+        left = scip.csr_matrix(left, dtype=bool)
+        left.eliminate_zeros()
+        result = BitsetMatrix.zeros((left.shape[0], right.shape[1]))
+        starts = left.indptr[:-1]
+        nonempty = np.diff(left.indptr) > 0
+        if nonempty.any():
+            result.words[nonempty] = np.bitwise_or.reduceat(right.words[left.indices], starts[nonempty], axis=0)
+        return result
@@ -0,0 +1,138 @@
+import networkx as nx
+import logging
+
+try:
+    import rustworkx as rx
+except ImportError:
+    rx = None
+
+logger = logging.getLogger("pastry")
+
+GRAPH_BACKENDS = ('rustworkx', 'networkx')
+
+
+def resolve_graph_backend(backend=None):
+    """
+    Returns the name of the graph backend to use. By default, rustworkx is used if it is installed.
+    """
+    if backend is None:
+        return 'rustworkx' if rx is not None else 'networkx'
+    if backend not in GRAPH_BACKENDS:
+        logger.error("Invalid graph backend: '%s'. Expected one of %s.", backend, ', '.join(GRAPH_BACKENDS))
+        raise ValueError("Unknown graph backend")
+    if backend == 'rustworkx' and rx is None:
+        logger.error("The graph backend 'rustworkx' was requested, but rustworkx is not installed.")
+        raise ValueError("rustworkx is not installed")
+    return backend
+
+
+class DiGraph:
+    """
+    Directed graph over hashable node labels. The labels are mapped to dense integer ids, on which the graph
+    algorithms of the backend (rustworkx or networkx) run.
+    """
+    def __init__(self, backend=None):
+        self.backend = resolve_graph_backend(backend)
+        self._labels = []
+        self._ids = dict()
+        if self.backend == 'rustworkx':
+            self._graph = rx.PyDiGraph(multigraph=False)
+        else:
+            self._graph = nx.DiGraph()
+
+    @classmethod
+    def from_csr(cls, indptr, indices, backend=None):
+        """
+        Creates a graph over the nodes 0, ..., n - 1 with an edge (i, j) for every column j of row i of a
+        CSR sparsity pattern.
+        """
+        graph = cls(backend)
+        nodes_num = len(indptr) - 1
+        graph.add_nodes_from(range(nodes_num))
+        indptr, indices = list(indptr), list(indices)
+        graph._add_id_edges([(i, int(j)) for i in range(nodes_num) for j in indices[indptr[i]:indptr[i + 1]]])
+        return graph
+
+    def _add_id_edges(self, id_edges):
+        if self.backend == 'rustworkx':
+            self._graph.extend_from_edge_list(id_edges)
+        else:
+            self._graph.add_edges_from(id_edges)
+
+    def _to_labels(self, ids):
+        return {self._labels[node_id] for node_id in ids}
+
+    def add_node(self, label):
+        """
+        Adds a node if it is not in the graph yet and returns its integer id.
+        """
+        node_id = self._ids.get(label)
+        if node_id is None:
+            node_id = len(self._labels)
+            if self.backend == 'rustworkx':
+                self._graph.add_node(None)
+            else:
+                self._graph.add_node(node_id)
+            self._ids[label] = node_id
+            self._labels.append(label)
+        return node_id
+
+    def add_nodes_from(self, labels):
+        for label in labels:
+            self.add_node(label)
+
+    def add_edge(self, label_from, label_to):
+        self._add_id_edges([(self.add_node(label_from), self.add_node(label_to))])
+
+    def add_edges_from(self, edges):
+        self._add_id_edges([(self.add_node(label_from), self.add_node(label_to)) for label_from, label_to in edges])
+
+    def has_node(self, label):
+        return label in self._ids
+
+    def number_of_nodes(self):
+        return len(self._labels)
+
+    def nodes(self):
+        return list(self._labels)
+
+    def edges(self):
+        if self.backend == 'rustworkx':
+            id_edges = self._graph.edge_list()
+        else:
+            id_edges = self._graph.edges()
+        return [(self._labels[id_from], self._labels[id_to]) for id_from, id_to in id_edges]
+
+    def out_degree(self, label):
+        return self._graph.out_degree(self._ids[label])
+
+    def descendants(self, label):
+        """
+        Returns the set of nodes reachable from a node, excluding the node itself.
+        """
+        if self.backend == 'rustworkx':
+            return self._to_labels(rx.descendants(self._graph, self._ids[label]))
+        return self._to_labels(nx.descendants(self._graph, self._ids[label]))
+
+    def ancestors(self, label):
+        """
+        Returns the set of nodes from which a node is reachable, excluding the node itself.
+        """
+        if self.backend == 'rustworkx':
+            return self._to_labels(rx.ancestors(self._graph, self._ids[label]))
+        return self._to_labels(nx.ancestors(self._graph, self._ids[label]))
+
+    def has_path(self, label_from, label_to):
+        if self.backend == 'rustworkx':
+            return rx.has_path(self._graph, self._ids[label_from], self._ids[label_to])
+        return nx.has_path(self._graph, self._ids[label_from], self._ids[label_to])
+
+    def strongly_connected_components(self):
+        """
+        Returns the strongly connected components as lists of nodes.
+        """
+        if self.backend == 'rustworkx':
+            components = rx.strongly_connected_components(self._graph)
+        else:
+            components = nx.strongly_connected_components(self._graph)
+        return [[self._labels[node_id] for node_id in component] for component in components]
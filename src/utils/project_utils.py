@@ -1,4 +1,3 @@
-from src.analysis.guard_analysis import get_threshold_and_period_from_spguard
 from probably.pgcl.ast import *
 import math
 import logging
@@ -19,28 +18,68 @@ def create_AsgnInstr_rhs(var_name, value):
     return BinopExpr(operator=(Binop.MINUS if value<0 else Binop.PLUS), lhs=VarExpr(var_name), rhs=NatLitExpr(abs(value)))
 
 
+def get_level_span(jump_bound, period):
+    """
+    Computes the number of counter values covered by one level of a regular Markov chain. The span is the
+    smallest multiple of the period that is at least the jump bound, so that no update skips a level.
+    """
+    return period * -(-jump_bound // period)
+
+
+def select_jump_bound(pts):
+    """
+    Selects the bound on counter updates that minimizes the total width of the two regular Markov chains.
+    Updates beyond the selected bound are split into chains of smaller steps by the PTS.
+    """
+    period_po = math.lcm(*[guard.get_table().period_positive for guard in pts.non_trivial_guards])
+    period_ne = math.lcm(*[guard.get_table().period_negative for guard in pts.non_trivial_guards])
+    updates = [abs(update) for update in pts.transitions.update.tolist()]
+
+    def total_width(jump_bound):
+        states_num = pts.states_num + sum(-(-update // jump_bound) - 1 for update in updates if update > jump_bound)
+        return states_num * (get_level_span(jump_bound, period_po) + get_level_span(jump_bound, period_ne))
+
+    max_jump = max(updates, default=0)
+    jump_bound = min(range(1, max(max_jump, 1) + 1), key=lambda bound: (total_width(bound), -bound))
+    logger.info("Selected jump bound %d for the regular Markov chains (maximal update: %d).", jump_bound, max_jump)
+    return jump_bound
+
+
 def analyze_threshold_and_period_from_pts(pts):
-    # If no non-trivial guards, return the initial value and unit period
-    if len(pts.non_trivial_guards) == 0:
-        return abs(pts.init_val), 1, 1
+    """
+    Determines the irregular part [-threshold_ne, threshold_po] of the counter values and the periods of the
+    guards on the positive and on the negative axis. Each threshold covers the guards on its side of the axis
+    only. The initial value is not covered, as an initial state beyond the thresholds is placed in a regular
+    Markov chain.
 
+    :return: The thresholds and periods (threshold_po, threshold_ne, period_po, period_ne). (tuple)
+    """
     # Initialize lists for thresholds and periods
-    thresholds = [pts.init_val]
-    positive_periods = []
-    negative_periods = []
+    thresholds_po = [0]
+    thresholds_ne = [0]
+    positive_periods = [1]
+    negative_periods = [1]
     
     # Compute thresholds and periods from non-trivial guards
     for guard in pts.non_trivial_guards:
-        guard_threshold, guard_period_positive, guard_period_negative = get_threshold_and_period_from_spguard(
-            guard.sp_expr)
-        thresholds.append(guard_threshold)
-        positive_periods.append(guard_period_positive)
-        negative_periods.append(guard_period_negative)
-
-    # Compute the maximum threshold and least common multiples of the periods
-    pts_threshold = max(thresholds)
+        guard_table = guard.get_table()
+        guard_threshold_po, guard_threshold_ne = guard_table.get_axis_thresholds()
+        thresholds_po.append(guard_threshold_po)
+        thresholds_ne.append(guard_threshold_ne)
+        positive_periods.append(guard_table.period_positive)
+        negative_periods.append(guard_table.period_negative)
+
+    # Compute the maximum thresholds and least common multiples of the periods
+    pts_threshold_po = max(thresholds_po)
+    pts_threshold_ne = max(thresholds_ne)
     pts_positive_period = math.lcm(*positive_periods)
     pts_negative_period = math.lcm(*negative_periods)
+
+    # Jumps must not cross the irregular part from one regular part into the other
+    missing_width = pts.max_jump - (pts_threshold_po + pts_threshold_ne + 1)
+    if missing_width > 0:
+        pts_threshold_ne += missing_width // 2
+        pts_threshold_po += missing_width - missing_width // 2
     
-    logger.info("Probabilistic Transition System threshold: %d, Positive axis period: %d, Negative axis period: %d", pts_threshold, pts_positive_period, pts_negative_period)
-    return pts_threshold, pts_positive_period, pts_negative_period
+    logger.info("Probabilistic Transition System thresholds: %d (positive axis), %d (negative axis), Positive axis period: %d, Negative axis period: %d", pts_threshold_po, pts_threshold_ne, pts_positive_period, pts_negative_period)
+    return pts_threshold_po, pts_threshold_ne, pts_positive_period, pts_negative_period
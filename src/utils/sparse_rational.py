@@ -0,0 +1,165 @@
+from fractions import Fraction
+import math
+import numpy as np
+import scipy.sparse as scip
+import sympy as sp
+
+
+def to_int_array(values):
+    """
+    Converts a sequence of Python integers to an int64 array, or to an object array if some value does not fit.
+    """
+    values = list(values)
+    if all(-2 ** 63 <= value < 2 ** 63 for value in values):
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=object)
+
+
+class SparseRationalMatrix:
+    """
+    Sparse matrix of exact rationals in CSR format. Row i holds the entries
+    numerators[indptr[i]:indptr[i + 1]] / denominators[i] in the columns indices[indptr[i]:indptr[i + 1]],
+    i.e., all entries of a row share one denominator. Integers beyond int64 are stored in object arrays.
+    """
+    def __init__(self, shape, indptr, indices, numerators, denominators):
+        self.shape = tuple(shape)
+        self.indptr = indptr
+        self.indices = indices
+        self.numerators = numerators
+        self.denominators = denominators
+
+    @classmethod
+    def from_entries(cls, shape, entries):
+        """
+        Creates a matrix from tuples (i, j, prob_num, prob_den). Entries at the same location add up.
+        """
+        rows = [dict() for _ in range(shape[0])]
+        for i, j, prob_num, prob_den in entries:
+            rows[i][j] = rows[i].get(j, 0) + Fraction(prob_num, prob_den)
+        return cls._from_rows(shape, rows)
+
+    @classmethod
+    def _from_rows(cls, shape, rows):
+        """
+        Creates a matrix from one dictionary {column: Fraction} per row, dropping zero entries.
+        """
+        indptr, indices, numerators, denominators = [0], [], [], []
+        for row in rows:
+            columns = sorted(j for j, value in row.items() if value != 0)
+            denominator = math.lcm(*(row[j].denominator for j in columns))
+            indices.extend(columns)
+            numerators.extend(row[j].numerator * (denominator // row[j].denominator) for j in columns)
+            denominators.append(denominator)
+            indptr.append(len(indices))
+        return cls(shape, np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64),
+                   to_int_array(numerators), to_int_array(denominators))
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def _row_of_entries(self):
+        """
+        Returns the row index of every stored entry.
+        """
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def __getitem__(self, location):
+        i, j = location
+        start, end = self.indptr[i], self.indptr[i + 1]
+        position = start + np.searchsorted(self.indices[start:end], j)
+        if position < end and self.indices[position] == j:
+            return Fraction(int(self.numerators[position]), int(self.denominators[i]))
+        return Fraction(0)
+
+    def row(self, i):
+        """
+        Returns the entries of a row as a dictionary {column: Fraction}.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        denominator = int(self.denominators[i])
+        return {j: Fraction(numerator, denominator)
+                for j, numerator in zip(self.indices[start:end].tolist(), self.numerators[start:end].tolist())}
+
+    def entries(self):
+        """
+        Yields every nonzero entry as a tuple (i, j, Fraction).
+        """
+        for i in range(self.shape[0]):
+            for j, value in self.row(i).items():
+                yield i, j, value
+
+    def nonzero_locs(self):
+        """
+        Returns the set of locations (i, j) of the nonzero entries.
+        """
+        return set(zip(self._row_of_entries().tolist(), self.indices.tolist()))
+
+    def to_bool(self):
+        """
+        Returns the nonzero pattern as a boolean SciPy CSR matrix.
+        """
+        return scip.csr_matrix((np.ones(self.nnz, dtype=bool), self.indices, self.indptr), shape=self.shape)
+
+    def to_float(self):
+        """
+        Returns the matrix as a SciPy CSR matrix of floats.
+        """
+        rows = self._row_of_entries()
+        if self.numerators.dtype == object or self.denominators.dtype == object:
+            data = np.array([numerator / denominator for numerator, denominator in
+                             zip(self.numerators.tolist(), self.denominators[rows].tolist())], dtype=float)
+        else:
+            data = self.numerators / self.denominators[rows]
+        return scip.csr_matrix((data, self.indices, self.indptr), shape=self.shape)
+
+    def to_sympy(self):
+        """
+        Returns the matrix as a dense sympy matrix of rationals.
+        """
+        matrix = sp.zeros(*self.shape)
+        for i, j, value in self.entries():
+            matrix[i, j] = sp.Rational(value.numerator, value.denominator)
+        return matrix
+
+    def submatrix(self, rows, columns):
+        """
+        Extracts the submatrix formed by the given rows and columns, in the given order.
+        """
+        column_positions = np.full(self.shape[1], -1, dtype=np.int64)
+        column_positions[np.asarray(columns, dtype=np.int64)] = np.arange(len(columns))
+        indptr, indices, numerators = [0], [], []
+        for i in rows:
+            start, end = self.indptr[i], self.indptr[i + 1]
+            positions = column_positions[self.indices[start:end]]
+            kept = positions >= 0
+            order = np.argsort(positions[kept], kind='stable')
+            indices.extend(positions[kept][order].tolist())
+            numerators.extend(self.numerators[start:end][kept][order].tolist())
+            indptr.append(len(indices))
+        return SparseRationalMatrix((len(rows), len(columns)), np.array(indptr, dtype=np.int64),
+                                    np.array(indices, dtype=np.int64), to_int_array(numerators),
+                                    to_int_array(self.denominators[np.asarray(rows, dtype=np.int64)].tolist()))
+
+    @classmethod
+    def block(cls, blocks):
+        """
+        Assembles a matrix from a nested list of blocks, where every block row consists of matrices with
+        the same number of rows and every block column of matrices with the same number of columns.
+        """
+        column_offsets = np.cumsum([0] + [matrix.shape[1] for matrix in blocks[0]]).tolist()
+        indptr, indices, numerators, denominators = [0], [], [], []
+        for block_row in blocks:
+            for i in range(block_row[0].shape[0]):
+                row_denominators = [int(matrix.denominators[i]) for matrix in block_row]
+                denominator = math.lcm(*row_denominators)
+                for matrix, offset, row_denominator in zip(block_row, column_offsets, row_denominators):
+                    start, end = matrix.indptr[i], matrix.indptr[i + 1]
+                    scale = denominator // row_denominator
+                    indices.extend((matrix.indices[start:end] + offset).tolist())
+                    numerators.extend(numerator * scale for numerator in matrix.numerators[start:end].tolist())
+                denominators.append(denominator)
+                indptr.append(len(indices))
+        shape = (sum(block_row[0].shape[0] for block_row in blocks), column_offsets[-1])
+        return cls(shape, np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64),
+                   to_int_array(numerators), to_int_array(denominators))